@@ -7,3 +7,10 @@ class Distribution(ABC):
 
     def ppf(self, q):
         pass
+
+    def cdf(self, x):
+        pass
+
+    def score(self, x):
+        # -d log f / dx, the sensitivity of the log density to a shift of its argument, for likelihood ratio Greeks
+        raise ValueError(f"{type(self).__name__} does not provide the score of its density")
@@ -13,3 +13,9 @@ class NormalDistribution(Distribution):
 
     def ppf(self, q):
         return norm.ppf(q, self.mean, self.std)
+
+    def cdf(self, x):
+        return norm.cdf(x, self.mean, self.std)
+
+    def score(self, x):
+        return (x - self.mean) / self.std**2
@@ -14,6 +14,13 @@ class ScaledTDistribution(Distribution):
     def ppf(self, q):
         return t.ppf(q, self.df, loc=self.loc, scale=self.scale)
 
+    def cdf(self, x):
+        return t.cdf(x, self.df, loc=self.loc, scale=self.scale)
+
+    def score(self, x):
+        u = (x - self.loc) / self.scale
+        return (self.df + 1) * u / ((self.df + u**2) * self.scale)
+
 class TDistribution(ScaledTDistribution):
     def __init__(self, df):
         super().__init__(df, loc=0, scale=1)
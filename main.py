@@ -2,12 +2,14 @@ from models.european.black_scholes import BlackScholesModel
 from models.american.binomial import BinomialModel
 from models.european.european_option_simulation import EuropeanOptionSimulationModel
 from models.american.least_squares_monte_carlo import LeastSquaresMonteCarloModel
+from models.parallel_monte_carlo import ParallelMonteCarloEngine
 
 from simulations.geometric_brownian_motion import GeometricBrownianMotion
 from distributions.normal_distribution import NormalDistribution
 from distributions.t_distribution import TDistribution
 
 import numpy as np
+import os
 
 
 # Example usage
@@ -53,6 +55,10 @@ if __name__ == "__main__":
     simulation_pricer = EuropeanOptionSimulationModel(gbm_model)
     print(f"European Call Price using Simulation (Normal Dist): {simulation_pricer.price(option_params)}")
 
+    # Sharding the same simulation over all cores, reproducible for a fixed seed and worker count
+    parallel_engine = ParallelMonteCarloEngine(workers=os.cpu_count(), executor='process', seed=42)
+    print(f"European Call Price using Parallel Simulation: {parallel_engine.price(simulation_pricer, option_params, simulation_params)}")
+
 
     # Using Binomial Model
     binomial_pricer = BinomialModel(steps)
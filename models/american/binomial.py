@@ -1,7 +1,20 @@
 import numpy as np
 from ..option_pricing_model import OptionPricingModel
+from models.european.black_scholes import BlackScholesModel
 
 class BinomialModel(OptionPricingModel):
+    def __init__(self, time_steps: int = 1000, lattice: str = 'ud_binomial', smoothing: str = None, richardson: bool = False):
+        # time_steps is the default tree size, a 'time_steps' entry in the params overrides it
+        self.time_steps = time_steps
+        self.lattice = lattice
+        self.smoothing = smoothing
+        self.richardson = richardson
+
+        if lattice not in ('ud_binomial', 'cox_ross_rubinstein', 'jarrow_rudd', 'leisen_reimer'):
+            raise ValueError("Lattice not recognized")
+        if smoothing not in (None, 'black_scholes'):
+            raise ValueError("Smoothing not recognized")
+
     def risk_neutral_prob(self, r, delta, h, u, d):
         return (np.exp((r - delta) * h) - d) / (u - d)
 
@@ -21,49 +34,220 @@ class BinomialModel(OptionPricingModel):
         d = np.exp((r - delta) * h - sigma * np.sqrt(h))
         return u, d
 
-    def price(self, params: dict):
-        S0 = params['initial_stock_price']
-        K = params['strike_price']
-        T = params['time_to_maturity']
-        r = params['risk_free_rate']
-        sigma = params['volatility']
-        delta = params.get('dividend_yield', 0.0)
-        option_type = params['option_type']
-        is_american = params.get('is_american', False)
-        steps = params.get('time_steps', 1000)
+    def peizer_pratt_inversion(self, z, steps):
+        return 0.5 + np.sign(z) * np.sqrt(0.25 - 0.25 * np.exp(-(z / (steps + 1/3 + 0.1 / (steps + 1)))**2 * (steps + 1/6)))
+
+    def leisen_reimer(self, S0, K, T, r, sigma, delta, steps):
+        # The lattice is centred on the strike, so it needs an odd number of steps
+        h = T / steps
+        d1 = BlackScholesModel().d1(S0, K, T, r, sigma, delta)
+        d2 = BlackScholesModel().d2(d1, sigma, T)
+        p = self.peizer_pratt_inversion(d2, steps)
+        p_prime = self.peizer_pratt_inversion(d1, steps)
+        growth = np.exp((r - delta) * h)
+        u = growth * p_prime / p
+        d = (growth - p * u) / (1 - p)
+        return u, d, p
+
+    def richardson_extrapolation(self, values, coarse_values, steps, coarse_steps, is_american):
+        # Extrapolates away the leading error term. It is O(1/n^2) for European contracts on an unsmoothed Leisen-Reimer lattice,
+        # but the early exercise boundary brings American contracts back to O(1/n), and so does Black-Scholes smoothing of the last step
+        order = np.where(is_american, 1, 2) if self.lattice == 'leisen_reimer' and self.smoothing is None else 1
+        steps, coarse_steps = float(steps), float(coarse_steps)
+        return (steps**order * values - coarse_steps**order * coarse_values) / (steps**order - coarse_steps**order)
+
+    def coarse_steps(self, steps):
+        # Richardson extrapolation compares the tree with one of about half the steps
+        if steps < 2:
+            raise ValueError("Richardson extrapolation needs at least two time steps")
+        return self.effective_steps(steps // 2)
+
+    def effective_steps(self, steps):
+        if self.lattice == 'leisen_reimer' and steps % 2 == 0:
+            return steps + 1
+        return steps
 
+    def lattice_parameters(self, S0, K, T, r, sigma, delta, steps):
         h = T / steps
-        u, d = self.ud_binomial(sigma, h, r, delta)
+        if self.lattice == 'leisen_reimer':
+            # Contracts sharing a Leisen-Reimer lattice share the strike
+            u, d, p = self.leisen_reimer(S0, np.ravel(K)[0], T, r, sigma, delta, steps)
+            return h, u, d, p
+
+        if self.lattice == 'ud_binomial':
+            u, d = self.ud_binomial(sigma, h, r, delta)
+        elif self.lattice == 'cox_ross_rubinstein':
+            u, d = self.cox_ross_rubinstein(sigma, h)
+        else:
+            u, d = self.jarrow_rudd(sigma, h, r, delta)
         p = self.risk_neutral_prob(r, delta, h, u, d)
+        return h, u, d, p
+
+    def terminal_stock_prices(self, S0, u, d, steps):
+        # Node j of the last layer has seen j up moves and steps - j down moves
+        j = np.arange(steps + 1)
+        return S0 * np.exp(j * np.log(u) + (steps - j) * np.log(d))
+
+    def option_sign(self, option_type):
+        if option_type == 'call':
+            return 1.0
+        elif option_type == 'put':
+            return -1.0
+        else:
+            raise ValueError("Option type not recognized")
+
+    def update_exercise_boundary(self, exercise_boundary, n, h, prices, exercise_values, option_values, sign):
+        exercise_boundary[n, 0] = n * h
+        exercise_is_beneficial = exercise_values > option_values
 
-        # Initialize the stock price grid
-        stock_prices = np.zeros((steps + 1, steps + 1))  # A two-dimensional grid of zeros
+        if np.any(exercise_is_beneficial):
+            if sign > 0:
+                # Get the first index where exercise is beneficial
+                exercise_boundary[n, 1] = prices[np.argmax(exercise_is_beneficial)]
+            else:
+                # Get the first index in the reversed array where exercise is beneficial
+                exercise_boundary[n, 1] = prices[n - np.argmax(exercise_is_beneficial[::-1])]
 
-        # Create an array of indices from 0 to N
-        n = np.arange(steps + 1)
+    def backward_induction(self, S0, K, r, h, u, d, p, steps, signs, is_american, exercise_boundary=None, sigma=None, delta=0.0, layers=None):
+        # All contracts share the lattice, only the strike, payoff sign and exercise style vary per row
+        K = np.asarray(K, dtype=np.float64).reshape(-1, 1)
+        signs = np.broadcast_to(np.asarray(signs, dtype=np.float64), (K.shape[0],)).reshape(-1, 1)
+        is_american = np.broadcast_to(np.asarray(is_american, dtype=bool), (K.shape[0],))
 
-        # Create a 2D grid of indices
-        N1, N2 = np.meshgrid(n, n)
+        # European rows get a zero exercise value, which never beats continuation
+        exercise_weights = signs * is_american.reshape(-1, 1)
 
-        # Calculate stock prices efficiently
-        stock_prices = S0 * np.power(u, N2) * np.power(d, (N1 - N2))
+        if self.smoothing == 'black_scholes':
+            # Binomial Black-Scholes: the last step is replaced by the closed-form European value
+            top = steps - 1
+            stock_prices = self.terminal_stock_prices(S0, u, d, top)
+            option_values = BlackScholesModel().price_batch(stock_prices, K, h, r, sigma, delta, signs > 0)
+            exercise = np.maximum(exercise_weights * (stock_prices - K), 0)
+            if exercise_boundary is not None and is_american[0]:
+                self.update_exercise_boundary(exercise_boundary, top, h, stock_prices, exercise[0], option_values[0], signs[0, 0])
+            np.maximum(option_values, exercise, out=option_values)
+        else:
+            top = steps
+            stock_prices = self.terminal_stock_prices(S0, u, d, top)
+            option_values = np.maximum(signs * (stock_prices - K), 0)
 
-        # Initialize the option values grid to just the exercise values
-        option_values = np.maximum(stock_prices - K, 0) if option_type == 'call' else np.maximum(K - stock_prices, 0)
+        # The first layers are copied out as the induction passes them, for the Greeks
+        if layers is not None and top < len(layers):
+            layers[top] = option_values[:, :top+1].copy()
+
+        # Only the current layer of stock prices and option values is kept, so memory is O(contracts * steps)
+        continuation = np.empty_like(option_values)
+        exercise_values = np.empty_like(option_values)
 
-        # Perform backward induction to calculate the option values at each node
         discount_factor = np.exp(-r * h)
-        for n in reversed(range(steps)):
-            option_values[:n+1, n] = discount_factor * (p * option_values[1:n+2, n+1] + (1 - p) * option_values[:n+1, n+1])
-            if is_american:
-                exercise_values = np.maximum(stock_prices[:n+1, n] - K, 0) if option_type == 'call' else np.maximum(K - stock_prices[:n+1, n], 0)
-                option_values[:n+1, n] = np.maximum(option_values[:n+1, n], exercise_values)
+        up_weight = discount_factor * p
+        down_weight = discount_factor * (1 - p)
+
+        # Perform backward induction, overwriting the value array in place
+        for n in reversed(range(top)):
+            values = option_values[:, :n+1]
+            np.multiply(option_values[:, 1:n+2], up_weight, out=continuation[:, :n+1])
+            values *= down_weight
+            values += continuation[:, :n+1]
+
+            if np.any(is_american):
+                # Node prices of layer n follow from layer n+1 by undoing one down move
+                prices = stock_prices[:n+1]
+                prices /= d
+                exercise = exercise_values[:, :n+1]
+                np.subtract(prices, K, out=exercise)
+                exercise *= exercise_weights
+                np.maximum(exercise, 0, out=exercise)
+
+                if exercise_boundary is not None:
+                    # Determine exercise boundary of the first contract
+                    self.update_exercise_boundary(exercise_boundary, n, h, prices, exercise[0], values[0], signs[0, 0])
+
+                np.maximum(values, exercise, out=values)
+
+            if layers is not None and n < len(layers):
+                layers[n] = values.copy()
+
+        return option_values[:, 0]
+
+    def tree_values(self, S0, K, T, r, sigma, delta, steps, signs, is_american, exercise_boundary=None):
+        h, u, d, p = self.lattice_parameters(S0, K, T, r, sigma, delta, steps)
+        return self.backward_induction(S0, K, r, h, u, d, p, steps, signs, is_american, exercise_boundary, sigma, delta)
+
+    def root_values(self, S0, K, T, r, sigma, delta, steps, signs, is_american, exercise_boundary=None):
+        if self.richardson:
+            coarse_steps = self.coarse_steps(steps)
+        steps = self.effective_steps(steps)
+        values = self.tree_values(S0, K, T, r, sigma, delta, steps, signs, is_american, exercise_boundary)
+
+        if self.richardson:
+            coarse_values = self.tree_values(S0, K, T, r, sigma, delta, coarse_steps, signs, is_american)
+            values = self.richardson_extrapolation(values, coarse_values, steps, coarse_steps, is_american)
+
+        return values
 
+    def layer_greeks(self, prices, values):
+        # Value, slope and curvature at the middle of three nodes, from the parabola through them
+        down_slope = (values[:, 1] - values[:, 0]) / (prices[1] - prices[0])
+        up_slope = (values[:, 2] - values[:, 1]) / (prices[2] - prices[1])
+        width = prices[2] - prices[0]
+        slope = (down_slope * (prices[2] - prices[1]) + up_slope * (prices[1] - prices[0])) / width
+        return values[:, 1], slope, 2 * (up_slope - down_slope) / width
 
+    def tree_greeks(self, S0, K, T, r, sigma, delta, steps, signs, is_american, extended_tree=False):
+        h = T / steps
+        if extended_tree:
+            # The tree starts two steps before today (Pelsser and Vorst), so today is a layer of three nodes centred on S0
+            # and delta and gamma are differences at S0 itself rather than one and two steps into the tree. The lattice is the one of
+            # the plain tree from S0 (the Leisen-Reimer one depends on where it starts), only its origin moves, so the middle node
+            # two steps in prices exactly as the plain tree does
+            _, u, d, p = self.lattice_parameters(S0, K, T, r, sigma, delta, steps)
+            root = S0 / (u * d)
+            layers = [None] * 5
+            self.backward_induction(root, K, r, h, u, d, p, steps + 2, signs, is_american, None, sigma, delta, layers)
+
+            price, option_delta, gamma = self.layer_greeks(self.terminal_stock_prices(root, u, d, 2), layers[2])
+            later_prices, later_values = self.terminal_stock_prices(root, u, d, 4)[2], layers[4][:, 2]
+        else:
+            _, u, d, p = self.lattice_parameters(S0, K, T, r, sigma, delta, steps)
+            layers = [None] * 3
+            self.backward_induction(S0, K, r, h, u, d, p, steps, signs, is_american, None, sigma, delta, layers)
+
+            up_price, down_price = S0 * u, S0 * d
+            price = layers[0][:, 0]
+            option_delta = (layers[1][:, 1] - layers[1][:, 0]) / (up_price - down_price)
+            _, _, gamma = self.layer_greeks(self.terminal_stock_prices(S0, u, d, 2), layers[2])
+            later_prices, later_values = self.terminal_stock_prices(S0, u, d, 2)[1], layers[2][:, 1]
+
+        # Two steps later the middle node is back at S0 only when u * d = 1, otherwise the move in the stock is taken out with delta
+        theta = (later_values - price - option_delta * (later_prices - S0)) / (2 * h)
+        return {'price': price, 'delta': option_delta, 'gamma': gamma, 'theta': theta}
 
-        return option_values[0, 0]
+    def root_greeks(self, S0, K, T, r, sigma, delta, steps, signs, is_american, extended_tree=False):
+        if self.richardson:
+            coarse_steps = self.coarse_steps(steps)
+        steps = self.effective_steps(steps)
+        greeks = self.tree_greeks(S0, K, T, r, sigma, delta, steps, signs, is_american, extended_tree)
+
+        if self.richardson:
+            coarse_greeks = self.tree_greeks(S0, K, T, r, sigma, delta, coarse_steps, signs, is_american, extended_tree)
+            greeks = {name: self.richardson_extrapolation(value, coarse_greeks[name], steps, coarse_steps, is_american) for name, value in greeks.items()}
+
+        return greeks
+
+    def price(self, params: dict):
+        S0 = params['initial_stock_price']
+        K = params['strike_price']
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        sigma = params['volatility']
+        delta = params.get('dividend_yield', 0.0)
+        option_type = params['option_type']
+        is_american = params.get('is_american', False)
+        steps = params.get('time_steps', self.time_steps)
+
+        return self.root_values(S0, K, T, r, sigma, delta, steps, self.option_sign(option_type), is_american)[0]
 
-        
     def price_and_boundary(self, params: dict):
         S0 = params['initial_stock_price']
         K = params['strike_price']
@@ -73,55 +257,60 @@ class BinomialModel(OptionPricingModel):
         delta = params.get('dividend_yield', 0.0)
         option_type = params['option_type']
         is_american = params.get('is_american', False)
-        steps = params.get('time_steps', 1000)
+        steps = params.get('time_steps', self.time_steps)
 
-        h = T / steps
-        u, d = self.ud_binomial(sigma, h, r, delta)
-        p = self.risk_neutral_prob(r, delta, h, u, d)
+        # Initialize an exercise boundary array for the finest tree
+        exercise_boundary = np.full((self.effective_steps(steps), 2), np.nan)
 
-        # Initialize the stock price grid
-        stock_prices = np.zeros((steps + 1, steps + 1))  # A two-dimensional grid of zeros
+        price = self.root_values(S0, K, T, r, sigma, delta, steps, self.option_sign(option_type), is_american, exercise_boundary)[0]
+        return price, exercise_boundary
 
-        # Create an array of indices from 0 to N
-        n = np.arange(steps + 1)
+    def price_and_greeks(self, params: dict, extended_tree: bool = False):
+        # Delta, gamma and theta are read off the first layers of the pricing tree, no extra trees are built
+        S0 = params['initial_stock_price']
+        K = params['strike_price']
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        sigma = params['volatility']
+        delta = params.get('dividend_yield', 0.0)
+        option_type = params['option_type']
+        is_american = params.get('is_american', False)
+        steps = params.get('time_steps', self.time_steps)
 
-        # Create a 2D grid of indices
-        N1, N2 = np.meshgrid(n, n)
+        greeks = self.root_greeks(S0, K, T, r, sigma, delta, steps, self.option_sign(option_type), is_american, extended_tree)
+        price = greeks.pop('price')[0]
+        return price, {name: value[0] for name, value in greeks.items()}
 
-        # Calculate stock prices efficiently
-        stock_prices = S0 * np.power(u, N2) * np.power(d, (N1 - N2))
+    def price_batch(self, S0, K, T, r, sigma, delta=0.0, is_call=True, is_american=True, time_steps=None):
+        return self.batch(lambda *args: {'price': self.root_values(*args)}, S0, K, T, r, sigma, delta, is_call, is_american, time_steps)['price']
 
-        # Initialize the option values grid to just the exercise values
-        option_values = np.maximum(stock_prices - K, 0) if option_type == 'call' else np.maximum(K - stock_prices, 0)
+    def greeks_batch(self, S0, K, T, r, sigma, delta=0.0, is_call=True, is_american=True, time_steps=None, extended_tree=False):
+        # Price, delta, gamma and theta of every contract, one tree per group of contracts sharing a lattice
+        return self.batch(lambda *args: self.root_greeks(*args, extended_tree), S0, K, T, r, sigma, delta, is_call, is_american, time_steps)
 
-        # Initialize an exercise boundary array
-        exercise_boundary = np.full((steps, 2), np.nan)
+    def batch(self, evaluate, S0, K, T, r, sigma, delta, is_call, is_american, time_steps):
+        if time_steps is None:
+            time_steps = self.time_steps
 
-        # Perform backward induction to calculate the option values at each node
-        discount_factor = np.exp(-r * h)
-        for n in reversed(range(steps)):
-            option_values[:n+1, n] = discount_factor * (p * option_values[1:n+2, n+1] + (1 - p) * option_values[:n+1, n+1])
-            if is_american:
-                exercise_values = np.maximum(stock_prices[:n+1, n] - K, 0) if option_type == 'call' else np.maximum(K - stock_prices[:n+1, n], 0)
-                
-                # Determine exercise boundary
-                exercise_boundary[n, 0] = n * h
-                exercise_is_beneficial = exercise_values > option_values[:n+1, n]
-
-                if np.any(exercise_is_beneficial):
-                    if option_type == 'call':
-                        # Get the first index where exercise is beneficial
-                        exercise_boundary[n, 1] = stock_prices[np.argmax(exercise_is_beneficial), n]
-                    elif option_type == 'put':
-                        # Get the first index in the reversed array where exercise is beneficial
-                        exercise_boundary[n, 1] = stock_prices[n-np.argmax(exercise_is_beneficial[::-1]), n]
-
-                    else:
-                        raise ValueError("Option type not recognized")
-
-                    
-                    
-
-                option_values[:n+1, n] = np.maximum(option_values[:n+1, n], exercise_values)
-
-        return option_values[0, 0], exercise_boundary
\ No newline at end of file
+        S0, K, T, r, sigma, delta, is_call, is_american = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma, delta)),
+            np.asarray(is_call, dtype=bool), np.asarray(is_american, dtype=bool))
+        results = {}
+
+        # Contracts with the same spot, maturity, rate, volatility and dividend yield share one lattice,
+        # except under Leisen-Reimer where the lattice is also centred on the strike
+        lattice_columns = [S0.ravel(), T.ravel(), r.ravel(), sigma.ravel(), delta.ravel()]
+        if self.lattice == 'leisen_reimer':
+            lattice_columns.append(K.ravel())
+        unique_keys, lattice_index = np.unique(np.stack(lattice_columns, axis=1), axis=0, return_inverse=True)
+        lattice_index = lattice_index.reshape(-1)
+
+        signs = np.where(is_call.ravel(), 1.0, -1.0)
+        for i, (lattice_S0, lattice_T, lattice_r, lattice_sigma, lattice_delta) in enumerate(unique_keys[:, :5]):
+            contracts = np.flatnonzero(lattice_index == i)
+            values = evaluate(lattice_S0, K.ravel()[contracts], lattice_T, lattice_r, lattice_sigma, lattice_delta, time_steps,
+                              signs[contracts], is_american.ravel()[contracts])
+            for name, value in values.items():
+                results.setdefault(name, np.empty(S0.size))[contracts] = value
+
+        return {name: value.reshape(S0.shape) for name, value in results.items()}
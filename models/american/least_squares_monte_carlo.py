@@ -1,97 +1,111 @@
-from sklearn.linear_model import LinearRegression
 from typing import Optional
 import numpy as np
 from models.simulation_based_option_pricing import SimulationBasedOptionPricingModel
+from models.american.regression import RegressionBasis, PolynomialBasis, least_squares
+from utils.running_statistics import RunningStatistics
 
 class LeastSquaresMonteCarloModel(SimulationBasedOptionPricingModel):
+    def __init__(self, simulator, basis: Optional[RegressionBasis] = None, backward_simulation: bool = False):
+        super().__init__(simulator)
+        # Defaults to the constant, x and x^2 regressors
+        self.basis = basis if basis is not None else PolynomialBasis(degree=2)
+        # Regenerate prices backward in time instead of storing the full paths x steps matrix
+        self.backward_simulation = backward_simulation
+
+        if backward_simulation and not simulator.supports_backward_simulation:
+            raise ValueError(f"{type(simulator).__name__} does not support backward simulation")
 
     def price(self, params: dict, simulation_params: Optional[dict] = None):
         price, boundary = self.price_and_boundary(params, simulation_params)
         return price
 
-    def price_and_boundary(self, params: dict, simulation_params: Optional[dict] = None): 
+    def backward_price_columns(self, simulation_params: Optional[dict] = None):
+        # Exercise can happen at every time step, so the full time grid is simulated
+        simulation_params = self.simulation_params_for({}, simulation_params)
+        if self.backward_simulation:
+            return self.simulator.simulate_backward(simulation_params)
+
+        prices = self.simulator.simulate(simulation_params)
+        return ((i, prices[:, i]) for i in range(prices.shape[1] - 1, -1, -1))
+
+    def price_and_boundary(self, params: dict, simulation_params: Optional[dict] = None):
+        option_values, exercise_boundary = self.path_values_and_boundary(params, simulation_params)
+        return np.mean(option_values, dtype=np.float64), exercise_boundary
+
+    def payoff_statistics(self, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        # The regressions need every path at once, so the paths are not chunked
+        return RunningStatistics().update(self.path_values_and_boundary(params, simulation_params)[0])
+
+    def path_values_and_boundary(self, params: dict, simulation_params: Optional[dict] = None):
+        # Discounted value of every path under the regressed exercise policy
         if not params['is_american']:
             raise ValueError("Least squares Monte Carlo only meant for American options")
-        
-        prices = self.simulator.simulate(simulation_params)
-        option_values = np.zeros_like(prices)
-        if params['option_type'] == 'call':
-            exercise_values = np.maximum(prices - params['strike_price'], 0)
+        shift_params = simulation_params if simulation_params is not None else self.simulator.simulation_params
+        if shift_params.get('importance_sampling', False) or shift_params.get('drift_shift') is not None:
+            raise ValueError("Least squares Monte Carlo does not support importance sampling")
+
+        K = params['strike_price']
+        option_type = params['option_type']
+        if option_type == 'call':
+            sign = 1.0
+        elif option_type == 'put':
+            sign = -1.0
         else:
-            exercise_values = np.maximum(params['strike_price'] - prices, 0)
+            raise ValueError("Invalid option type")
 
-        option_values[:, -1] = exercise_values[:, -1]
+        # Stock prices arrive one time step at a time, from maturity back to today
+        columns = self.backward_price_columns(simulation_params)
+        steps, terminal_prices = next(columns)
 
-        N = exercise_values.shape[1]
+        # Only O(paths) state is kept: the option values along each path at the current step
+        option_values = np.maximum(sign * (terminal_prices - K), 0).astype(np.float64)
 
-        dt = params['time_to_maturity'] / N
+        dt = params['time_to_maturity'] / steps
         # Pre-compute constants
         discount_factor = np.exp(-params['risk_free_rate'] * dt)
 
+        exercise_boundary = np.full((steps + 1, 2), np.nan)
 
-        did_exercise_matrix = np.zeros_like(exercise_values)
-        # set last column of did_exercise_matrix to 1 if exercise value is positive, else 0
-        did_exercise_matrix[:, -1] = exercise_values[:, -1] > 0
-
-        exercise_boundary = np.full((N, 2), np.nan)
+        # Design matrix buffer reused by every regression
+        design = np.empty((option_values.shape[0], self.basis.size()))
 
         # Loop through each time step (backwards)
-        for i in range(N-2, -1, -1):
-            # Identify paths where option is in the money
-            e = exercise_values[:, i] > 0
+        for i, stock_prices in columns:
+            # The discounted option value at the next time step. The reason we do this instead of the discounted realized cash flows along each path, is because we make sure the option value for the next step always is updated with either the exercise value or the discounted value from the next step, a bit unlike how they do it in longstaff-schwartz
+            option_values *= discount_factor
 
+            exercise_values = np.maximum(sign * (stock_prices - K), 0)
+
+            # Identify paths where option is in the money
+            e = exercise_values > 0
 
             # Proceed if there are paths where exercise is beneficial
             if np.any(e):
-                # Y is the discounted option value at the next time step. The reason we do this instead of the discounted realized cash flows along each path, is because we make sure the option value for the next step always is updated with either the exercise value or the Y from the next step, a bit unlike how they do it in longstaff-schwartz
-                Y = discount_factor * option_values[e, i+1]
+                Y = option_values[e]
+                in_the_money_prices = stock_prices[e]
+                in_the_money_exercise_values = exercise_values[e]
 
-                # Prepare the regressors, X, X^2 and constant
-                X = prices[e, i].reshape(-1, 1)
-                pows = np.arange(2, 3) # x^2
-                X = np.concatenate([X] + [X ** i for i in pows], axis=1)
+                # Prepare the regressors on strike-normalized prices, which keeps the Gram matrix well conditioned
+                X = self.basis.evaluate(in_the_money_prices / K, design[:Y.shape[0]], in_the_money_exercise_values / K)
 
-                # Linear regression
-                model = LinearRegression().fit(X, Y)
-
-                # Use the model to predict continuation values
-                predicted_continuation_values = model.predict(X)
+                # Least squares regression, used to predict continuation values
+                coefficients = least_squares(X, Y)
+                predicted_continuation_values = X @ coefficients
 
                 # Check if exercising is beneficial compared to continuation value
-                exercise_chosen = exercise_values[e, i] >= predicted_continuation_values
-
-                # Store the decision to exercise or not
-                did_exercise_matrix[e, i] = exercise_chosen.astype(int)
+                exercise_chosen = in_the_money_exercise_values >= predicted_continuation_values
 
-                # Update option values, based on the decision to exercise or not, if exercise is beneficial, set option value to exercise value, else set to Y, which is the discounted option value at the next time step for that path
-                option_values[e, i] = np.where(exercise_chosen, exercise_values[e, i], Y)
+                # Update option values, based on the decision to exercise or not, if exercise is beneficial, set option value to exercise value, else keep the discounted option value from the next time step for that path
+                option_values[e] = np.where(exercise_chosen, in_the_money_exercise_values, Y)
 
                 # Store the exercise boundary as the minimum/maximum price where exercise is chosen
                 exercise_boundary[i, 0] = i*dt
                 if np.any(exercise_chosen):
-                    if params['option_type'] == 'call':
+                    if option_type == 'call':
                         # Get lowest price where exercise is beneficial
-                        exercise_boundary[i, 1] = np.min(prices[e, i]+1e6*(1-did_exercise_matrix[e, i])) 
-                    elif params['option_type'] == 'put':
-                        # Get highest price where exercise is beneficial
-                        exercise_boundary[i, 1] = np.max(prices[e, i]-1e6*(1-did_exercise_matrix[e, i]))
+                        exercise_boundary[i, 1] = np.min(in_the_money_prices[exercise_chosen])
                     else:
-                        raise ValueError("Invalid option type")
-
-
-
-            # Paths where exercise value is 0
-            en = ~e
-
-            # Update option values for paths where exercise is not beneficial
-            option_values[en, i] = discount_factor * option_values[en, i+1]
-
-
-        average_value = np.mean(option_values[:, 0])
-
-        # Make sure only first 1s in exercise_boundary are used
-        first_ones = np.argmax(did_exercise_matrix, axis=1)
-        did_exercise_matrix = np.zeros_like(did_exercise_matrix)
-        did_exercise_matrix[np.arange(len(first_ones)), first_ones] = 1
+                        # Get highest price where exercise is beneficial
+                        exercise_boundary[i, 1] = np.max(in_the_money_prices[exercise_chosen])
 
-        return average_value, exercise_boundary
+        return option_values, exercise_boundary
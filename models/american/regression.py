@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve, LinAlgError
+
+
+class RegressionBasis(ABC):
+    def __init__(self, degree: int = 2):
+        self.degree = degree
+
+    def size(self):
+        return self.degree + 1
+
+    @abstractmethod
+    def evaluate(self, x, out, payoff=None):
+        # Fill the columns of out with the basis functions evaluated at the (strike-normalized) prices x
+        pass
+
+
+class PolynomialBasis(RegressionBasis):
+    def evaluate(self, x, out, payoff=None):
+        out[:, 0] = 1.0
+        for k in range(1, self.degree + 1):
+            np.multiply(out[:, k-1], x, out=out[:, k])
+        return out
+
+
+class LaguerreBasis(RegressionBasis):
+    # A constant plus `degree` exponentially weighted Laguerre polynomials, as in Longstaff-Schwartz
+    def evaluate(self, x, out, payoff=None):
+        out[:, 0] = 1.0
+        if self.degree == 0:
+            return out
+
+        weight = np.exp(-x / 2)
+        previous = np.ones_like(x)
+        current = 1 - x
+        out[:, 1] = weight
+        for k in range(1, self.degree):
+            np.multiply(current, weight, out=out[:, k+1])
+            previous, current = current, ((2 * k + 1 - x) * current - k * previous) / (k + 1)
+        return out
+
+
+class HermiteBasis(RegressionBasis):
+    # Probabilists' Hermite polynomials, centred on the strike
+    def evaluate(self, x, out, payoff=None):
+        z = x - 1
+        out[:, 0] = 1.0
+        if self.degree >= 1:
+            out[:, 1] = z
+        for k in range(1, self.degree):
+            np.multiply(out[:, k], z, out=out[:, k+1])
+            out[:, k+1] -= k * out[:, k-1]
+        return out
+
+
+class PayoffAugmentedBasis(RegressionBasis):
+    # Any basis extended with a power of the (strike-normalized) exercise value as an extra regressor. The regressions only see
+    # in-the-money paths, where the exercise value is affine in x, so it is raised to one more than the basis degree to stay
+    # out of the span of the basis (and the Gram matrix full rank)
+    def __init__(self, basis: RegressionBasis):
+        super().__init__(basis.degree)
+        self.basis = basis
+
+    def size(self):
+        return self.basis.size() + 1
+
+    def evaluate(self, x, out, payoff=None):
+        if payoff is None:
+            raise ValueError("Payoff basis requires the exercise values")
+        self.basis.evaluate(x, out[:, :-1])
+        np.power(payoff, self.basis.degree + 1, out=out[:, -1])
+        return out
+
+
+def least_squares(X, Y):
+    # Solve the normal equations on the small Gram matrix, falling back to SVD if it is singular
+    gram = X.T @ X
+    moments = X.T @ Y
+    try:
+        return cho_solve(cho_factor(gram), moments)
+    except LinAlgError:
+        return np.linalg.lstsq(X, Y, rcond=None)[0]
@@ -0,0 +1,49 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from models.european.black_scholes import BlackScholesModel
+
+
+class ControlVariate(ABC):
+    # A per-path quantity with a known expectation, computed from the same draws as the payoffs. The pricer regresses
+    # the payoffs on its controls and removes the part of the payoff noise they explain
+    @abstractmethod
+    def values(self, params: dict, simulator, samples):
+        pass
+
+    @abstractmethod
+    def expectation(self, params: dict, simulator):
+        pass
+
+
+class BlackScholesControlVariate(ControlVariate):
+    # The discounted European payoff on a geometric Brownian motion driven by the simulator's own Brownian increments,
+    # priced by Black-Scholes. Without a volatility the simulator's reference volatility is used
+    def __init__(self, volatility: float = None):
+        self.volatility = volatility
+
+    def control_volatility(self, simulator):
+        return self.volatility if self.volatility is not None else simulator.reference_volatility()
+
+    def values(self, params: dict, simulator, samples):
+        S0 = simulator.simulation_params['initial_stock_price']
+        delta = simulator.simulation_params.get('dividend_yield', 0.0)
+        K = params['strike_price']
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        option_type = params['option_type']
+        sigma = self.control_volatility(simulator)
+
+        normals, dt = simulator.brownian_increments(samples)
+        brownian_motion = np.asarray(normals, dtype=np.float64) @ np.sqrt(dt)
+        terminal_prices = S0 * np.exp((r - delta - 0.5 * sigma**2) * T + sigma * brownian_motion)
+
+        if option_type == 'call':
+            payoffs = np.maximum(terminal_prices - K, 0)
+        elif option_type == 'put':
+            payoffs = np.maximum(K - terminal_prices, 0)
+        else:
+            raise ValueError("Invalid option type")
+        return np.exp(-r * T) * payoffs
+
+    def expectation(self, params: dict, simulator):
+        return BlackScholesModel().price({**simulator.simulation_params, **params, 'volatility': self.control_volatility(simulator)})
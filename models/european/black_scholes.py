@@ -27,3 +27,42 @@ class BlackScholesModel(OptionPricingModel):
         else:
             raise ValueError("Invalid option type")
         return price
+
+    def batch_inputs(self, S0, K, T, r, sigma, delta=0.0, is_call=True):
+        # Broadcast the columns of an option chain to a common shape
+        S0, K, T, r, sigma, delta = (np.asarray(x, dtype=np.float64) for x in (S0, K, T, r, sigma, delta))
+        return np.broadcast_arrays(S0, K, T, r, sigma, delta, np.asarray(is_call, dtype=bool))
+
+    def price_batch(self, S0, K, T, r, sigma, delta=0.0, is_call=True):
+        S0, K, T, r, sigma, delta, is_call = self.batch_inputs(S0, K, T, r, sigma, delta, is_call)
+
+        d1 = self.d1(S0, K, T, r, sigma, delta)
+        d2 = self.d2(d1, sigma, T)
+
+        # A put is the call formula with the signs of d1, d2 and both legs flipped
+        sign = np.where(is_call, 1.0, -1.0)
+        return sign * (S0 * np.exp(-delta * T) * norm.cdf(sign * d1) - K * np.exp(-r * T) * norm.cdf(sign * d2))
+
+    def greeks_batch(self, S0, K, T, r, sigma, delta=0.0, is_call=True):
+        S0, K, T, r, sigma, delta, is_call = self.batch_inputs(S0, K, T, r, sigma, delta, is_call)
+
+        d1 = self.d1(S0, K, T, r, sigma, delta)
+        d2 = self.d2(d1, sigma, T)
+        sqrt_T = np.sqrt(T)
+        dividend_discount = np.exp(-delta * T)
+        discount = np.exp(-r * T)
+        pdf_d1 = norm.pdf(d1)
+
+        sign = np.where(is_call, 1.0, -1.0)
+        cdf_d1 = norm.cdf(sign * d1)
+        cdf_d2 = norm.cdf(sign * d2)
+
+        return {
+            'price': sign * (S0 * dividend_discount * cdf_d1 - K * discount * cdf_d2),
+            'delta': sign * dividend_discount * cdf_d1,
+            'gamma': dividend_discount * pdf_d1 / (S0 * sigma * sqrt_T),
+            'vega': S0 * dividend_discount * pdf_d1 * sqrt_T,
+            'theta': (-S0 * dividend_discount * pdf_d1 * sigma / (2 * sqrt_T)
+                      + sign * (delta * S0 * dividend_discount * cdf_d1 - r * K * discount * cdf_d2)),
+            'rho': sign * K * T * discount * cdf_d2,
+        }
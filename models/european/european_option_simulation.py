@@ -3,14 +3,23 @@ import numpy as np
 
 class EuropeanOptionSimulationModel(SimulationBasedOptionPricingModel):
     def price(self, params: dict, simulation_params: dict=None, simulated_prices: np.array=None):
+        if simulated_prices is None:
+            return self.price_and_standard_error(params, simulation_params)[0]
+
+        # Calculate the option price as the average discounted payoff
+        option_price = np.mean(self.discounted_payoffs(params, simulated_prices), dtype=np.float64)
+        return option_price
+
+    def observation_times(self, params: dict, simulation_params: dict):
+        # Only the terminal price matters, so simulators that can skip the intermediate steps do
+        return [simulation_params['time_to_maturity']]
+
+    def discounted_payoffs(self, params: dict, simulated_prices: np.ndarray):
         K = params['strike_price']
         T = params['time_to_maturity']
         r = params['risk_free_rate']
         option_type = params['option_type']
 
-        if simulated_prices is None:
-            simulated_prices = self.simulator.simulate(simulation_params)
-
         # Calculate the payoff for each path
         if option_type == 'call':
             payoffs = np.maximum(simulated_prices[:, -1] - K, 0)
@@ -20,10 +29,12 @@ class EuropeanOptionSimulationModel(SimulationBasedOptionPricingModel):
             raise ValueError("Invalid option type")
 
         # Discount the payoffs back to the present value
-        discounted_payoffs = np.exp(-r * T) * payoffs
-
-        # Calculate the option price as the average discounted payoff
-        option_price = np.mean(discounted_payoffs)
-        return option_price
+        return np.exp(-r * T) * payoffs
 
+    def pathwise_payoffs(self, params: dict, sensitivity_steps):
+        # Only the terminal step matters
+        for prices, delta_paths, vega_paths in sensitivity_steps:
+            pass
 
+        K = params['strike_price']
+        return self.option_payoff_sensitivities(params, prices, K, (delta_paths, vega_paths), (0.0, 0.0))
@@ -0,0 +1,133 @@
+import numpy as np
+from models.option_pricing_model import OptionPricingModel
+
+class HestonModel(OptionPricingModel):
+    def __init__(self, expansion_terms: int = 256, truncation_width: float = 24.0, tolerance: float = 1e-8):
+        # Fourier-cosine (COS) expansion of the risk-neutral density on [a, b], set from the first two cumulants of the log return.
+        # expansion_terms is doubled until the characteristic function has decayed below the tolerance at the highest frequency
+        self.expansion_terms = expansion_terms
+        self.truncation_width = truncation_width
+        self.tolerance = tolerance
+
+    def characteristic_function(self, u, T, r, delta, v0, kappa, theta, volvol, rho):
+        # Characteristic function of log(S_T / S0), in the form of Albrecher et al. that avoids the branch cut of the complex logarithm
+        beta = kappa - 1j * rho * volvol * u
+        d = np.sqrt(beta**2 + volvol**2 * (u**2 + 1j * u))
+        g = (beta - d) / (beta + d)
+        e = np.exp(-d * T)
+
+        variance_term = v0 / volvol**2 * (beta - d) * (1 - e) / (1 - g * e)
+        mean_reversion_term = kappa * theta / volvol**2 * ((beta - d) * T - 2 * np.log((1 - g * e) / (1 - g)))
+        return np.exp(1j * u * (r - delta) * T + variance_term + mean_reversion_term)
+
+    def characteristic_function_gradient(self, u, T, r, delta, v0, kappa, theta, volvol, rho):
+        # The characteristic function and its derivatives with respect to (v0, kappa, theta, volvol, rho), by the chain rule through beta, d, g and e
+        beta = kappa - 1j * rho * volvol * u
+        c = u**2 + 1j * u
+        d = np.sqrt(beta**2 + volvol**2 * c)
+        g = (beta - d) / (beta + d)
+        e = np.exp(-d * T)
+
+        F = (beta - d) * (1 - e) / (1 - g * e)
+        H = (beta - d) * T - 2 * np.log((1 - g * e) / (1 - g))
+        log_phi = 1j * u * (r - delta) * T + v0 * F / volvol**2 + kappa * theta * H / volvol**2
+        phi = np.exp(log_phi)
+
+        zero = np.zeros_like(beta)
+        one = np.ones_like(beta)
+        gradient = np.empty((5,) + np.shape(phi), dtype=complex)
+        gradient[0] = F / volvol**2
+        gradient[2] = kappa * H / volvol**2
+
+        # Derivatives of beta and volvol with respect to kappa, volvol and rho
+        for index, d_beta, d_volvol in ((1, one, zero), (3, -1j * rho * u * one, one), (4, -1j * volvol * u * one, zero)):
+            d_d = (beta * d_beta + volvol * c * d_volvol) / d
+            d_g = 2 * (d * d_beta - beta * d_d) / (beta + d)**2
+            d_e = -T * e * d_d
+            d_ge = d_g * e + g * d_e
+
+            d_F = ((d_beta - d_d) * (1 - e) - (beta - d) * d_e) / (1 - g * e) + F * d_ge / (1 - g * e)
+            d_H = (d_beta - d_d) * T + 2 * d_ge / (1 - g * e) - 2 * d_g / (1 - g)
+            gradient[index] = (v0 * d_F + kappa * theta * d_H) / volvol**2 - 2 * (v0 * F + kappa * theta * H) / volvol**3 * d_volvol
+        gradient[1] += theta * H / volvol**2
+
+        return phi, gradient * phi
+
+    def cumulants(self, T, r, delta, v0, kappa, theta, volvol, rho):
+        # First two cumulants of log(S_T / S0), from Fang and Oosterlee (2008)
+        decay = np.exp(-kappa * T)
+        c1 = (r - delta) * T + (1 - decay) * (theta - v0) / (2 * kappa) - 0.5 * theta * T
+        c2 = 1 / (8 * kappa**3) * (volvol * T * kappa * decay * (v0 - theta) * (8 * kappa * rho - 4 * volvol)
+                                   + kappa * rho * volvol * (1 - decay) * (16 * theta - 8 * v0)
+                                   + 2 * theta * kappa * T * (-4 * kappa * rho * volvol + volvol**2 + 4 * kappa**2)
+                                   + volvol**2 * ((theta - 2 * v0) * decay**2 + theta * (6 * decay - 7) + 2 * v0)
+                                   + 8 * kappa**2 * (v0 - theta) * (1 - decay))
+        return c1, c2
+
+    def truncation_range(self, log_moneyness, T, r, delta, v0, kappa, theta, volvol, rho):
+        # One range for log(S_T / K) that covers every strike, so the payoff coefficients are shared
+        c1, c2 = self.cumulants(T, r, delta, v0, kappa, theta, volvol, rho)
+        half_width = self.truncation_width * np.sqrt(np.abs(c2))
+        return np.min(log_moneyness) + c1 - half_width, np.max(log_moneyness) + c1 + half_width
+
+    def expansion_size(self, a, b, T, r, delta, v0, kappa, theta, volvol, rho):
+        # Heavy tails widen [a, b] and short maturities flatten the characteristic function, both need more terms
+        terms = self.expansion_terms
+        while terms < 2**16 and np.abs(self.characteristic_function(terms * np.pi / (b - a), T, r, delta, v0, kappa, theta, volvol, rho)) > self.tolerance:
+            terms *= 2
+        return terms
+
+    def put_coefficients(self, a, b, terms):
+        # Cosine coefficients of the put payoff (1 - e^y)^+ per unit strike, which integrates over [a, min(b, 0)]
+        frequencies = np.arange(terms) * np.pi / (b - a)
+        c, d = a, np.clip(0.0, a, b)
+
+        chi = (np.cos(frequencies * (d - a)) * np.exp(d) - np.cos(frequencies * (c - a)) * np.exp(c)
+               + frequencies * (np.sin(frequencies * (d - a)) * np.exp(d) - np.sin(frequencies * (c - a)) * np.exp(c))) / (1 + frequencies**2)
+        psi = np.empty(terms)
+        psi[0] = d - c
+        psi[1:] = (np.sin(frequencies[1:] * (d - a)) - np.sin(frequencies[1:] * (c - a))) / frequencies[1:]
+
+        coefficients = 2 / (b - a) * (psi - chi)
+        # The first term of the cosine series is weighted by one half
+        coefficients[0] *= 0.5
+        return frequencies, coefficients
+
+    def put_prices(self, S0, K, T, r, delta, v0, kappa, theta, volvol, rho):
+        log_moneyness = np.log(S0 / K)
+        a, b = self.truncation_range(log_moneyness, T, r, delta, v0, kappa, theta, volvol, rho)
+        terms = self.expansion_size(a, b, T, r, delta, v0, kappa, theta, volvol, rho)
+        frequencies, coefficients = self.put_coefficients(a, b, terms)
+
+        # The characteristic function is evaluated once, only the phase depends on the strike
+        weights = self.characteristic_function(frequencies, T, r, delta, v0, kappa, theta, volvol, rho) * coefficients
+        phases = np.exp(1j * np.outer(log_moneyness - a, frequencies))
+        return K * np.exp(-r * T) * (phases @ weights).real
+
+    def price_strikes(self, params: dict, strikes, is_call=True):
+        # Prices a vector of strikes for one maturity in a single expansion, calls follow from put-call parity
+        S0 = params['initial_stock_price']
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        delta = params.get('dividend_yield', 0.0)
+        v0 = params['initial_variance']
+        kappa = params['kappa']
+        theta = params['theta']
+        volvol = params['volvol']
+        rho = params['rho']
+
+        strikes, is_call = np.broadcast_arrays(np.asarray(strikes, dtype=np.float64), np.asarray(is_call, dtype=bool))
+        puts = self.put_prices(S0, strikes.ravel(), T, r, delta, v0, kappa, theta, volvol, rho).reshape(strikes.shape)
+        calls = puts + S0 * np.exp(-delta * T) - strikes * np.exp(-r * T)
+
+        # Deep in the wings the expansion can fall a rounding error below zero
+        return np.maximum(np.where(is_call, calls, puts), 0.0)
+
+    def price(self, params: dict):
+        K = params['strike_price']
+        option_type = params['option_type']
+        if option_type not in ('call', 'put'):
+            raise ValueError("Invalid option type")
+
+        prices = self.price_strikes(params, K, option_type == 'call')
+        return prices if np.ndim(K) else prices.item()
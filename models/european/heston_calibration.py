@@ -0,0 +1,118 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from scipy.optimize import least_squares
+from models.european.black_scholes import BlackScholesModel
+from models.european.heston import HestonModel
+from utils.option_utils import OptionUtils
+
+class HestonCalibrator:
+    # Order of the parameter vector seen by the optimizer, the names match the HestonProcess simulation params
+    parameter_names = ('initial_variance', 'kappa', 'theta', 'volvol', 'rho')
+
+    def __init__(self, model: HestonModel = None, objective: str = 'implied_volatility', workers: int = 4,
+                 lower_bounds=(1e-4, 1e-3, 1e-4, 1e-2, -0.999), upper_bounds=(4.0, 20.0, 4.0, 5.0, 0.999)):
+        # 'implied_volatility' divides the price errors by the Black-Scholes vega at the market volatility, a first order implied volatility error
+        if objective not in ('price', 'implied_volatility'):
+            raise ValueError("Objective not recognized")
+
+        self.model = model if model is not None else HestonModel()
+        self.objective = objective
+        self.workers = workers
+        self.lower_bounds = np.asarray(lower_bounds, dtype=np.float64)
+        self.upper_bounds = np.asarray(upper_bounds, dtype=np.float64)
+        self.result = None
+
+    def maturity_slices(self, S0, K, T, r, q, is_call, x):
+        # Quotes sharing a maturity share one COS grid. The truncation range, number of terms, payoff coefficients and
+        # strike phases are fixed for the whole optimization, so an iteration only evaluates the characteristic function
+        keys, slice_index = np.unique(np.stack([T, r, q], axis=1), axis=0, return_inverse=True)
+        slice_index = slice_index.reshape(-1)
+
+        slices = []
+        for i, (slice_T, slice_r, slice_q) in enumerate(keys):
+            quotes = np.flatnonzero(slice_index == i)
+            log_moneyness = np.log(S0 / K[quotes])
+            a, b = self.model.truncation_range(log_moneyness, slice_T, slice_r, slice_q, *x)
+            terms = self.model.expansion_size(a, b, slice_T, slice_r, slice_q, *x)
+            frequencies, coefficients = self.model.put_coefficients(a, b, terms)
+
+            slices.append({
+                'quotes': quotes,
+                'maturity': (slice_T, slice_r, slice_q),
+                'frequencies': frequencies,
+                'coefficients': coefficients,
+                'phases': np.exp(1j * np.outer(log_moneyness - a, frequencies)),
+                'discounted_strikes': K[quotes] * np.exp(-slice_r * slice_T),
+                # Calls follow from the put expansion by put-call parity, which does not depend on the parameters
+                'parity': np.where(is_call[quotes], S0 * np.exp(-slice_q * slice_T) - K[quotes] * np.exp(-slice_r * slice_T), 0.0),
+            })
+        return slices
+
+    def slice_prices_and_gradients(self, maturity_slice, x):
+        phi, gradient = self.model.characteristic_function_gradient(maturity_slice['frequencies'], *maturity_slice['maturity'], *x)
+
+        # Prices and their gradients come out of one product with the cached phase matrix
+        weights = np.vstack([phi, gradient]) * maturity_slice['coefficients']
+        values = maturity_slice['discounted_strikes'][:, None] * (maturity_slice['phases'] @ weights.T).real
+        return values[:, 0] + maturity_slice['parity'], values[:, 1:]
+
+    def prices_and_gradients(self, slices, x, executor=None):
+        count = sum(maturity_slice['quotes'].shape[0] for maturity_slice in slices)
+        prices = np.empty(count)
+        gradients = np.empty((count, len(self.parameter_names)))
+
+        mapper = executor.map if executor is not None else map
+        for maturity_slice, (slice_prices, slice_gradients) in zip(slices, mapper(lambda s: self.slice_prices_and_gradients(s, x), slices)):
+            prices[maturity_slice['quotes']] = slice_prices
+            gradients[maturity_slice['quotes']] = slice_gradients
+        return prices, gradients
+
+    def quote_weights(self, S0, K, T, r, q, is_call, market_prices):
+        if self.objective == 'price':
+            return np.ones(market_prices.shape), None
+
+        # Quotes without an implied volatility, outside the no-arbitrage bounds, get no weight
+        implied_volatilities = OptionUtils.find_implied_volatility_batch(market_prices, S0, K, T, r, q, is_call)[0]
+        vegas = BlackScholesModel().greeks_batch(S0, K, T, r, np.nan_to_num(implied_volatilities, nan=1.0), q, is_call)['vega']
+
+        # Far out of the money the vega vanishes, so it is floored to keep those quotes from dominating
+        weights = np.where(np.isfinite(implied_volatilities), 1 / np.maximum(vegas, 1e-4 * S0), 0.0)
+        return weights, implied_volatilities
+
+    def initial_guess(self, implied_volatilities):
+        variance = np.nanmean(implied_volatilities)**2 if implied_volatilities is not None and np.any(np.isfinite(implied_volatilities)) else 0.04
+        return np.array([variance, 2.0, variance, 0.5, -0.5])
+
+    def fit(self, S0, K, T, r, market_prices, q=0.0, is_call=True, initial_params: dict = None):
+        K, T, r, q, market_prices, is_call = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64).ravel() for x in (K, T, r, q, market_prices)), np.asarray(is_call, dtype=bool).ravel())
+        weights, implied_volatilities = self.quote_weights(S0, K, T, r, q, is_call, market_prices)
+        if not np.any(weights > 0):
+            raise ValueError("No quotes to calibrate to")
+
+        if initial_params is None:
+            x = self.initial_guess(implied_volatilities)
+        else:
+            x = np.array([initial_params[name] for name in self.parameter_names], dtype=np.float64)
+        x = np.clip(x, self.lower_bounds, self.upper_bounds)
+
+        # The optimizer asks for residuals and the Jacobian separately, both come from one evaluation
+        evaluation = {}
+        def evaluate(x):
+            if evaluation.get('x') is None or not np.array_equal(evaluation['x'], x):
+                prices, gradients = self.prices_and_gradients(slices, x, executor)
+                evaluation.update(x=x.copy(), residuals=weights * (prices - market_prices), jacobian=weights[:, None] * gradients)
+            return evaluation
+
+        with ThreadPoolExecutor(self.workers) if self.workers > 1 else nullcontext() as executor:
+            # The grids are fixed at the starting point, then rebuilt once at the first optimum and the fit is polished on them
+            for stage in range(2):
+                slices = self.maturity_slices(S0, K, T, r, q, is_call, x)
+                evaluation.clear()
+                self.result = least_squares(lambda x: evaluate(x)['residuals'], x, jac=lambda x: evaluate(x)['jacobian'],
+                                            bounds=(self.lower_bounds, self.upper_bounds), x_scale='jac')
+                x = self.result.x
+
+        return dict(zip(self.parameter_names, x.tolist()))
+
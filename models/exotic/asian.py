@@ -1,111 +1,221 @@
 from models.simulation_based_option_pricing import SimulationBasedOptionPricingModel
 from models.option_pricing_model import OptionPricingModel
+from itertools import chain
 import numpy as np
 from scipy.stats import norm
+from utils.running_statistics import RunningStatistics
 
 class AsianOptionSimulationModel(SimulationBasedOptionPricingModel):
     def price(self, params: dict, simulation_params: dict=None, simulated_prices: np.array=None):
-        K = params['strike_price']
+        if simulated_prices is None:
+            # Stream the simulation step by step, so no path matrix is built
+            return self.price_and_standard_error(params, simulation_params)[0]
+
+        # Calculate the option price as the average discounted payoff
+        option_price = np.mean(self.discounted_payoffs(params, simulated_prices), dtype=np.float64)
+        return option_price
+
+    def observation_times(self, params: dict, simulation_params: dict):
+        # With explicit fixing dates only those and maturity, for the terminal price, are simulated. Otherwise the average runs over every time step
+        fixing_times = params.get('fixing_times')
+        if fixing_times is None:
+            return None
+
+        fixing_times = np.asarray(fixing_times, dtype=np.float64)
         T = params['time_to_maturity']
-        r = params['risk_free_rate']
-        option_type = params['option_type']
-        asian_type = params['asian_type']
-        average_type = params['average_type']
+        if fixing_times[-1] < T * (1 - 1e-12):
+            return np.append(fixing_times, T)
+        return fixing_times
 
-        if simulated_prices is None:
-            simulated_prices = self.simulator.simulate(simulation_params)
+    def fixing_count(self, params: dict):
+        # Number of observed steps after today that are fixings, the rest is maturity observed for the terminal price only.
+        # None when every step is a fixing
+        fixing_times = params.get('fixing_times')
+        if fixing_times is None or not self.simulator.supports_observation_times:
+            return None
+        return len(fixing_times)
+
+    def path_sums(self, price_steps, fixing_count: int = None):
+        # Running sums of the prices and log prices at the fixings after today, accumulated in double precision,
+        # so neither the path matrix nor its logarithm is ever stored
+        price_steps = iter(price_steps)
+        today = np.asarray(next(price_steps), dtype=np.float64)
+        arithmetic_sum = np.zeros_like(today)
+        log_sum = np.zeros_like(today)
+        fixings = 0
+
+        prices = today
+        for prices in price_steps:
+            if fixing_count is None or fixings < fixing_count:
+                arithmetic_sum += prices
+                log_sum += np.log(prices)
+                fixings += 1
+
+        return today, np.asarray(prices, dtype=np.float64), arithmetic_sum, log_sum, fixings
 
-        # Calculate the average price for each path
+    def average_prices(self, params: dict, path_sums: tuple):
+        today, terminal_prices, arithmetic_sum, log_sum, fixings = path_sums
+
+        # Today's price is a fixing as well, unless the fixing dates are given
+        if params.get('fixing_times') is None:
+            arithmetic_sum = arithmetic_sum + today
+            log_sum = log_sum + np.log(today)
+            fixings += 1
+
+        average_type = params['average_type']
         if average_type == 'arithmetic':
-            average_prices = np.mean(simulated_prices, axis=1)
+            return arithmetic_sum / fixings
         elif average_type == 'geometric':
-            average_prices = np.exp(np.mean(np.log(simulated_prices), axis=1))
+            return np.exp(log_sum / fixings)
         else:
             raise ValueError("Invalid average type")
 
+    def option_payoffs(self, option_type: str, S1, S2):
+        if option_type == 'call':
+            return np.maximum(S1 - S2, 0)
+        elif option_type == 'put':
+            return np.maximum(S2 - S1, 0)
+        else:
+            raise ValueError("Invalid option type")
+
+    def discounted_payoffs_from_sums(self, params: dict, path_sums: tuple):
+        K = params['strike_price']
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        asian_type = params['asian_type']
+
+        average_prices = self.average_prices(params, path_sums)
         if asian_type == 'price':
             S1 = average_prices
             S2 = K
         elif asian_type == 'strike':
-            S1 = simulated_prices[:, -1]
+            S1 = path_sums[1]
             S2 = average_prices
         else:
             raise ValueError("Invalid Asian option type")
-        
-        # Calculate the payoff for each path
-        if option_type == 'call':
-            payoffs = np.maximum(S1 - S2, 0)
-        elif option_type == 'put':
-            payoffs = np.maximum(S2 - S1, 0)
-        else:
-            raise ValueError("Invalid option type")
 
         # Discount the payoffs back to the present value
-        discounted_payoffs = np.exp(-r * T) * payoffs
+        return np.exp(-r * T) * self.option_payoffs(params['option_type'], S1, S2)
 
-        # Calculate the option price as the average discounted payoff
-        option_price = np.mean(discounted_payoffs)
-        return option_price
+    def discounted_payoffs(self, params: dict, simulated_prices: np.ndarray):
+        return self.discounted_payoffs_from_sums(params, self.path_sums(simulated_prices.T, self.fixing_count(params)))
 
-    def arithmetic_price_geometric_control_variate(self, params: dict, simulation_params: dict=None):
-        K = params['strike_price']
-        T = params['time_to_maturity']
-        r = params['risk_free_rate']
-        option_type = params['option_type']
+    def pathwise_payoffs(self, params: dict, sensitivity_steps):
+        # The derivatives of the average follow from the derivatives of the fixings: an arithmetic average is linear in them,
+        # a geometric average moves with their mean relative change
+        sensitivity_steps = iter(sensitivity_steps)
+        today = next(sensitivity_steps)
 
-        simulated_prices = self.simulator.simulate(simulation_params)
+        # Today's price is a fixing as well, unless the fixing dates are given
+        if params.get('fixing_times') is None:
+            sensitivity_steps = chain([today], sensitivity_steps)
 
-        # Calculate the average price for each path
-        average_prices = np.mean(simulated_prices, axis=1)
-        geometric_average_prices = np.exp(np.mean(np.log(simulated_prices), axis=1))
+        fixing_count = self.fixing_count(params)
+        price_sum, delta_sum, vega_sum, log_sum, relative_delta_sum, relative_vega_sum = (np.zeros(today[0].shape) for _ in range(6))
+        fixings = 0
+        for step in sensitivity_steps:
+            prices, delta_paths, vega_paths = (np.asarray(x, dtype=np.float64) for x in step)
+            # Maturity is observed for the terminal price, it only joins the average when it is a fixing
+            if fixing_count is not None and fixings == fixing_count:
+                continue
+            price_sum += prices
+            delta_sum += delta_paths
+            vega_sum += vega_paths
+            log_sum += np.log(prices)
+            relative_delta_sum += delta_paths / prices
+            relative_vega_sum += vega_paths / prices
+            fixings += 1
 
-        # Calculate the payoff for each path
-        if option_type == 'call':
-            payoffs = np.maximum(average_prices - K, 0)
-            geometric_payoffs = np.maximum(geometric_average_prices - K, 0)
-        elif option_type == 'put':
-            payoffs = np.maximum(K - average_prices, 0)
-            geometric_payoffs = np.maximum(K - geometric_average_prices, 0)
+        average_type = params['average_type']
+        if average_type == 'arithmetic':
+            average = price_sum / fixings
+            average_sensitivities = (delta_sum / fixings, vega_sum / fixings)
+        elif average_type == 'geometric':
+            average = np.exp(log_sum / fixings)
+            average_sensitivities = (average * relative_delta_sum / fixings, average * relative_vega_sum / fixings)
         else:
-            raise ValueError("Invalid option type")
+            raise ValueError("Invalid average type")
 
-        # Discount the payoffs back to the present value
-        discounted_payoffs = np.exp(-r * T) * payoffs
-        geometric_discounted_payoffs = np.exp(-r * T) * geometric_payoffs
-
-        # Simulate some more paths to estimate the covariance
-        additional_simulated_prices = self.simulator.simulate(simulation_params)
-        additional_average_prices = np.mean(additional_simulated_prices, axis=1)
-        additional_geometric_average_prices = np.exp(np.mean(np.log(additional_simulated_prices), axis=1))
-        
-        if option_type == 'call':
-            additional_payoffs = np.maximum(additional_average_prices - K, 0)
-            additional_geometric_payoffs = np.maximum(additional_geometric_average_prices - K, 0)
-        elif option_type == 'put':
-            additional_payoffs = np.maximum(K - additional_average_prices, 0)
-            additional_geometric_payoffs = np.maximum(K - additional_geometric_average_prices, 0)
+        asian_type = params['asian_type']
+        if asian_type == 'price':
+            return self.option_payoff_sensitivities(params, average, params['strike_price'], average_sensitivities, (0.0, 0.0))
+        elif asian_type == 'strike':
+            return self.option_payoff_sensitivities(params, prices, average, (delta_paths, vega_paths), average_sensitivities)
         else:
-            raise ValueError("Invalid option type")
+            raise ValueError("Invalid Asian option type")
+
+    def pathwise_gamma(self, params: dict, samples, delta):
+        # With today's price in the average the payoff also depends on S0 directly, and the in-the-money indicator moves with it.
+        # Integrating that term by parts over the first simulated price S_1, whose density is q(S_1 / S0) / S0, turns it into
+        # likelihood ratio weights again. With N fixings including today and D the pathwise delta, the gamma of a path is
+        # D (S0 score - 1) / S0 + D (S0 score + 1) / (sum of the prices after today) for an arithmetic average
+        # and D (S0 score N / (N - 1) - 1) / S0 for a geometric one
+        if params.get('fixing_times') is not None:
+            return super().pathwise_gamma(params, samples, delta)
+        if params['asian_type'] != 'price':
+            # The floating strike payoff is not monotone in S_1, so the integration by parts has no finite variance
+            raise ValueError("Likelihood ratio gamma of average strike options needs explicit fixing times after today")
+
+        S0 = self.simulator.simulation_params['initial_stock_price']
+        score = self.simulator.initial_price_score(samples)
+        _, _, arithmetic_sum, _, fixings = self.path_sums(self.simulator.price_steps_from_samples(samples))
+
+        average_type = params['average_type']
+        if average_type == 'arithmetic':
+            return delta * (S0 * score - 1) / S0 + delta * (S0 * score + 1) / arithmetic_sum
+        elif average_type == 'geometric':
+            return delta * (S0 * score * (fixings + 1) / fixings - 1) / S0
+        else:
+            raise ValueError("Invalid average type")
+
+    def payoff_statistics(self, params: dict, simulation_params: dict = None, chunk_size: int = None):
+        statistics = RunningStatistics()
+        for samples in self.simulator.sample_chunks(chunk_size, self.simulation_params_for(params, simulation_params)):
+            payoffs = self.discounted_payoffs_from_sums(params, self.path_sums(self.simulator.price_steps_from_samples(samples), self.fixing_count(params)))
+            statistics.update(self.with_controls(params, samples, payoffs))
+        return statistics
+
+    def geometric_control_variate_statistics(self, params: dict, simulation_params: dict = None, chunk_size: int = None):
+        # Joint moments of the arithmetic average price payoff and its geometric counterpart, gathered in one pass
+        K = params['strike_price']
+        discount_factor = np.exp(-params['risk_free_rate'] * params['time_to_maturity'])
+        arithmetic_params = {**params, 'asian_type': 'price', 'average_type': 'arithmetic'}
+
+        statistics = RunningStatistics()
+        for samples in self.simulator.sample_chunks(chunk_size, self.simulation_params_for(params, simulation_params)):
+            path_sums = self.path_sums(self.simulator.price_steps_from_samples(samples), self.fixing_count(params))
+            payoffs = self.discounted_payoffs_from_sums(arithmetic_params, path_sums)
 
-        additional_discounted_payoffs = np.exp(-r * T) * additional_payoffs
-        additional_geometric_discounted_payoffs = np.exp(-r * T) * additional_geometric_payoffs
-        
-        # Calculate the covariance
-        cov = np.cov(additional_discounted_payoffs, additional_geometric_discounted_payoffs)
-        
-        # Now back to the option price
+            # The control averages over the fixings after today, which is what the closed form prices
+            log_sum, fixings = path_sums[3], path_sums[4]
+            geometric_payoffs = discount_factor * self.option_payoffs(params['option_type'], np.exp(log_sum / fixings), K)
+            statistics.update(self.importance_weighted(samples, np.column_stack((payoffs, geometric_payoffs))))
+
+        return statistics
+
+    def arithmetic_price_geometric_control_variate_and_standard_error(self, params: dict, simulation_params: dict = None, chunk_size: int = None):
+        simulation_params = self.simulation_params_for(params, simulation_params)
+        statistics = self.geometric_control_variate_statistics(params, simulation_params, chunk_size)
+
+        fixing_times = params.get('fixing_times')
+        if fixing_times is None:
+            steps = simulation_params.get('time_steps', 1000)
+            fixing_times = simulation_params['time_to_maturity'] * np.arange(1, steps + 1) / steps
         geometric_option_pricer = AnalyticalGeometricAsianOptionPricingModel()
-        true_geometric_option_price = geometric_option_pricer.price({**simulation_params, **params})
+        true_geometric_option_price = geometric_option_pricer.price({**simulation_params, **params, 'asian_type': 'price', 'fixing_times': fixing_times})
 
-        adjusted_arithmetic_option_prices = discounted_payoffs + cov[0, 1] / cov[1, 1] * (true_geometric_option_price - geometric_discounted_payoffs)
+        # Beta comes from the same paths, its O(1/paths) bias is negligible next to the standard error
+        mean = statistics.mean
+        covariance = statistics.covariance
+        beta = covariance[0, 1] / covariance[1, 1]
+        option_price = mean[0] + beta * (true_geometric_option_price - mean[1])
 
-        # Calculate the option price as the average discounted payoff
-        option_price = np.mean(adjusted_arithmetic_option_prices)
-        
-        return option_price
+        # The adjusted payoff keeps only the part of the arithmetic payoff variance the control does not explain
+        variance = max(covariance[0, 0] - beta * covariance[0, 1], 0.0)
+        return option_price, np.sqrt(variance / statistics.count)
 
-        
-                                                     
+    def arithmetic_price_geometric_control_variate(self, params: dict, simulation_params: dict=None, chunk_size: int = None):
+        return self.arithmetic_price_geometric_control_variate_and_standard_error(params, simulation_params, chunk_size)[0]
 
 
 class AnalyticalGeometricAsianOptionPricingModel(OptionPricingModel):
@@ -115,15 +225,24 @@ class AnalyticalGeometricAsianOptionPricingModel(OptionPricingModel):
         T = params['time_to_maturity']
         r = params['risk_free_rate']
         sigma = params['volatility']
-        n = params['time_steps']
+        n = params.get('time_steps')
         asian_type = params['asian_type']
 
         if asian_type == 'price':
-            mu = (r - 0.5 * sigma**2) * (n + 1) / (2 * n) + 0.5 * sigma**2 / n
-            sigma_hat = sigma * np.sqrt((n + 1) * (2 * n + 1) / (6 * n**2))
-            d1 = (np.log(S0 / K) + (mu + 0.5 * sigma_hat**2) * T) / (sigma_hat * np.sqrt(T))
-            d2 = d1 - sigma_hat * np.sqrt(T)
-            price = S0 * np.exp((mu - r) * T) * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
+            # The log of the geometric average over fixings t_1, ..., t_n is normal, with mean and variance set by the fixing dates
+            delta = params.get('dividend_yield', 0.0)
+            times = params.get('fixing_times')
+            if times is None:
+                times = T * np.arange(1, n + 1) / n
+            times = np.asarray(times, dtype=np.float64)
+
+            log_mean = np.log(S0) + (r - delta - 0.5 * sigma**2) * np.mean(times)
+            log_std = sigma * np.sqrt(np.mean(np.minimum.outer(times, times)))
+            d2 = (log_mean - np.log(K)) / log_std
+            d1 = d2 + log_std
+
+            sign = 1.0 if params.get('option_type', 'call') == 'call' else -1.0
+            price = sign * np.exp(-r * T) * (np.exp(log_mean + 0.5 * log_std**2) * norm.cdf(sign * d1) - K * norm.cdf(sign * d2))
         elif asian_type == 'strike':
             mu = (r - 0.5 * sigma**2) * (n - 1) / (2 * n) + 0.5 * sigma**2 / n
             sigma_hat = sigma * np.sqrt((n - 1) * (2 * n - 1) / (6 * n**2))
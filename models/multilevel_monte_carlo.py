@@ -0,0 +1,124 @@
+import time
+from typing import Optional
+import numpy as np
+from models.simulation_based_option_pricing import SimulationBasedOptionPricingModel
+from utils.running_statistics import RunningStatistics
+
+
+class MultilevelMonteCarloEngine:
+    # Giles' multilevel Monte Carlo: level l simulates base_steps * 2^l time steps and estimates E[P_l - P_{l-1}] from a fine
+    # and a coarse path driven by the same draws, so the corrections have small variance and few paths are needed on fine grids
+    def __init__(self, base_steps: int = 4, initial_paths: int = 1024, min_levels: int = 2, max_levels: int = 10,
+                 chunk_size: int = 8192, seed: Optional[int] = None):
+        if min_levels < 2 or max_levels < min_levels:
+            raise ValueError("Need at least two levels above the coarsest and max_levels >= min_levels")
+
+        self.base_steps = base_steps
+        self.initial_paths = initial_paths
+        self.min_levels = min_levels
+        self.max_levels = max_levels
+        self.chunk_size = chunk_size
+        # Every level extends its own Sobol scramble, spawned from this seed
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+
+    def level_simulation_params(self, pricer: SimulationBasedOptionPricingModel, params: dict, simulation_params: dict, level: int):
+        level_params = {**simulation_params, 'time_steps': self.base_steps * 2**level}
+        shift = simulation_params.get('drift_shift')
+        if np.ndim(shift) == 1:
+            # A drift shift of the coarsest grid's draws is split evenly over the 2^l steps each of them covers on this grid,
+            # which keeps the drift of the Brownian motions
+            level_params['drift_shift'] = np.repeat(np.reshape(shift, (self.base_steps, -1)), 2**level, axis=0).ravel() / 2**(level / 2)
+        return pricer.simulation_params_for(params, level_params)
+
+    def level_costs(self, levels: int):
+        # Time steps simulated per sample, the coarse path of a correction costs half its fine path
+        steps = self.base_steps * 2.0**np.arange(levels)
+        steps[1:] *= 1.5
+        return steps
+
+    def level_payoffs(self, pricer: SimulationBasedOptionPricingModel, params: dict, level_params: list, level: int,
+                      paths: int, offset: int, seed: int):
+        # level_params holds the simulation params of every level up to this one
+        simulator = pricer.simulator
+        simulator.simulation_params = level_params[level]
+        samples = simulator.quasi_random_samples(paths, offset, seed)
+        fine_payoffs = pricer.discounted_payoffs(params, simulator.simulate_from_samples(samples))
+        if level > 0:
+            coarse_samples = simulator.coarse_samples(samples)
+            simulator.simulation_params = level_params[level - 1]
+            fine_payoffs = np.asarray(fine_payoffs, dtype=np.float64) - pricer.discounted_payoffs(params, simulator.simulate_from_samples(coarse_samples))
+
+        # Under a drift shift the coarse path is a function of the fine draws, so both are weighted by the fine likelihood ratio
+        simulator.simulation_params = level_params[level]
+        return pricer.importance_weighted(samples, fine_payoffs)
+
+    def convergence_rate(self, values):
+        # Rate at which the corrections shrink per level, fitted over the levels above the coarsest
+        levels = np.arange(1, values.shape[0])
+        slope = -np.polyfit(levels, np.log2(np.maximum(values[1:], 1e-300)), 1)[0]
+        return max(slope, 0.5)
+
+    def optimal_paths(self, rmse, variances, costs):
+        # Paths per level minimizing the cost for a sampling variance of rmse^2 / 2, N_l proportional to sqrt(V_l / C_l)
+        return np.ceil(2 / rmse**2 * np.sqrt(variances / costs) * np.sum(np.sqrt(variances * costs)))
+
+    def price_to_rmse(self, pricer: SimulationBasedOptionPricingModel, params: dict, rmse: float, simulation_params: Optional[dict] = None):
+        # Levels are added until the estimated bias is below rmse / sqrt(2), and paths until the sampling error is too.
+        # Returns the price, its standard error and the per level breakdown of paths, cost and wall time
+        if simulation_params is None:
+            simulation_params = pricer.simulator.simulation_params
+        if simulation_params.get('importance_sampling', False) and simulation_params.get('drift_shift') is None:
+            # The automatic drift shift is searched for on the coarsest grid only
+            simulation_params = {**simulation_params, 'drift_shift': self.level_simulation_params(pricer, params, simulation_params, 0)['drift_shift']}
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(self.seed).spawn(self.max_levels + 1)]
+
+        statistics = []
+        wall_times = []
+        level_params = []
+        new_paths = np.full(self.min_levels + 1, self.initial_paths)
+        while True:
+            for level, paths in enumerate(new_paths):
+                if level == len(statistics):
+                    statistics.append(RunningStatistics())
+                    wall_times.append(0.0)
+                    level_params.append(self.level_simulation_params(pricer, params, simulation_params, level))
+
+                level_start = time.perf_counter()
+                for block in range(0, int(paths), self.chunk_size):
+                    block_paths = min(self.chunk_size, int(paths) - block)
+                    statistics[level].update(self.level_payoffs(pricer, params, level_params, level, block_paths, statistics[level].count, seeds[level]))
+                wall_times[level] += time.perf_counter() - level_start
+
+            counts = np.array([level_statistics.count for level_statistics in statistics])
+            means = np.abs([level_statistics.mean for level_statistics in statistics])
+            variances = np.array([level_statistics.variance for level_statistics in statistics])
+            costs = self.level_costs(len(statistics))
+
+            new_paths = np.maximum(self.optimal_paths(rmse, variances, costs) - counts, 0).astype(int)
+            if np.any(new_paths > 0.01 * counts):
+                continue
+
+            # The remaining bias from the last (at most three) corrections, assuming they keep shrinking at the fitted weak order.
+            # Level 0 estimates the price itself rather than a correction, so it never enters
+            alpha = self.convergence_rate(means)
+            corrections = means[max(1, len(means) - 3):]
+            bias = np.max(corrections * 2.0**(alpha * np.arange(1 - corrections.shape[0], 1))) / (2**alpha - 1)
+            if bias <= rmse / np.sqrt(2) or len(statistics) == self.max_levels + 1:
+                break
+
+            # A new level, with its variance extrapolated at the fitted strong rate until it has been sampled
+            beta = self.convergence_rate(variances)
+            variances = np.append(variances, variances[-1] / 2**beta)
+            counts = np.append(counts, 0)
+            new_paths = np.maximum(self.optimal_paths(rmse, variances, self.level_costs(len(variances))) - counts, 0).astype(int)
+
+        price = sum(level_statistics.mean for level_statistics in statistics)
+        standard_error = np.sqrt(sum(level_statistics.variance / level_statistics.count for level_statistics in statistics))
+        levels = [{'level': level, 'time_steps': self.base_steps * 2**level, 'paths': level_statistics.count,
+                   'mean': level_statistics.mean, 'variance': level_statistics.variance,
+                   'cost': level_statistics.count * cost, 'wall_time': wall_time}
+                  for level, (level_statistics, cost, wall_time) in enumerate(zip(statistics, costs, wall_times))]
+        return price, standard_error, levels
+
+    def price(self, pricer: SimulationBasedOptionPricingModel, params: dict, rmse: float, simulation_params: Optional[dict] = None):
+        return self.price_to_rmse(pricer, params, rmse, simulation_params)[0]
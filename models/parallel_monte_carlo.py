@@ -0,0 +1,66 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+import numpy as np
+from models.simulation_based_option_pricing import SimulationBasedOptionPricingModel
+from utils.running_statistics import RunningStatistics
+
+
+def shard_payoff_statistics(pricer: SimulationBasedOptionPricingModel, params: dict, simulation_params: dict, chunk_size: Optional[int]):
+    return pricer.payoff_statistics(params, simulation_params, chunk_size)
+
+
+class ParallelMonteCarloEngine:
+    def __init__(self, workers: int = 4, executor: str = 'thread', seed: Optional[int] = None, stream_splitting: str = 'sobol_blocks'):
+        if executor not in ('thread', 'process'):
+            raise ValueError("Executor must be 'thread' or 'process'")
+        if stream_splitting not in ('sobol_blocks', 'independent'):
+            raise ValueError("Stream splitting must be 'sobol_blocks' or 'independent'")
+
+        self.workers = workers
+        self.executor = executor
+        self.stream_splitting = stream_splitting
+        # Without a seed the run is still consistent across shards, just not reproducible between runs
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+
+    def shard_simulation_params(self, simulation_params: dict):
+        simulations = simulation_params.get('simulation_paths', 10000)
+        base, extra = divmod(simulations, self.workers)
+        sizes = [base + 1] * extra + [base] * (self.workers - extra)
+
+        seed_sequence = np.random.SeedSequence(self.seed)
+        if self.stream_splitting == 'independent':
+            # Every shard gets its own scramble from a spawned child seed
+            seeds = [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(self.workers)]
+            offsets = [0] * self.workers
+        else:
+            # All shards share one scramble and take disjoint consecutive blocks of the Sobol sequence
+            seeds = [int(seed_sequence.generate_state(1)[0])] * self.workers
+            offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).tolist()
+
+        return [{**simulation_params, 'simulation_paths': size, 'seed': seed, 'sample_offset': offset}
+                for size, seed, offset in zip(sizes, seeds, offsets) if size > 0]
+
+    def payoff_statistics(self, pricer: SimulationBasedOptionPricingModel, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        # Resolved once, so the shards share the observation times and any automatic drift shift
+        simulation_params = pricer.simulation_params_for(params, simulation_params)
+
+        shards = self.shard_simulation_params(simulation_params)
+        pool = ThreadPoolExecutor if self.executor == 'thread' else ProcessPoolExecutor
+        with pool(max_workers=self.workers) as executor:
+            # Each shard works on its own copy, since simulators keep their parameters as state
+            futures = [executor.submit(shard_payoff_statistics, copy.deepcopy(pricer), params, shard, chunk_size) for shard in shards]
+            results = [future.result() for future in futures]
+
+        # Merge in shard order, so the result does not depend on which worker finished first
+        statistics = RunningStatistics()
+        for result in results:
+            statistics.merge(result)
+        return statistics
+
+    def price_and_standard_error(self, pricer: SimulationBasedOptionPricingModel, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        statistics = self.payoff_statistics(pricer, params, simulation_params, chunk_size)
+        return pricer.estimate(params, statistics, simulation_params)
+
+    def price(self, pricer: SimulationBasedOptionPricingModel, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        return self.price_and_standard_error(pricer, params, simulation_params, chunk_size)[0]
@@ -1,12 +1,215 @@
 from abc import ABC, abstractmethod
 from typing import Optional
+import time
+import numpy as np
+from scipy.optimize import minimize
+from distributions.normal_distribution import NormalDistribution
+from utils.running_statistics import RunningStatistics
 
 
 
 class SimulationBasedOptionPricingModel(ABC):
-    def __init__(self, simulator):
+    def __init__(self, simulator, control_variates: Optional[list] = None):
         self.simulator = simulator
+        # ControlVariate instances evaluated on the same draws as the payoffs
+        self.control_variates = control_variates if control_variates is not None else []
 
     @abstractmethod
     def price(self, params: dict, simulation_params: Optional[dict] = None):
         pass
+
+    def observation_times(self, params: dict, simulation_params: dict):
+        # Times the payoff depends on, None when it needs every time step
+        return None
+
+    def simulation_params_for(self, params: dict, simulation_params: Optional[dict] = None):
+        # Every pricer sets (or clears) the observation times itself, so none are left over from another pricer
+        if simulation_params is None:
+            simulation_params = self.simulator.simulation_params
+        simulation_params = {key: value for key, value in simulation_params.items() if key != 'observation_times'}
+
+        times = self.observation_times(params, simulation_params)
+        if times is not None and self.simulator.supports_observation_times:
+            simulation_params['observation_times'] = times
+
+        # 'importance_sampling' picks the drift shift for this contract, unless one is given
+        if simulation_params.get('importance_sampling', False) and simulation_params.get('drift_shift') is None:
+            simulation_params['drift_shift'] = self.optimal_drift_shift(params, simulation_params)
+        return simulation_params
+
+    def optimal_drift_shift(self, params: dict, simulation_params: dict):
+        # Glasserman, Heidelberger and Shahabuddin: shift the standardized draws to the z maximizing log payoff(z) - |z|^2 / 2, the
+        # most likely way for a path to pay off, which for GBM is the optimal drift of the Brownian motion. A scan over even drifts
+        # of one Brownian motion at a time finds a paying start, then a gradient search refines it on the simulator's own paths
+        simulator = self.simulator
+        distribution = simulator.sample_distribution()
+        if not isinstance(distribution, NormalDistribution):
+            raise ValueError("A drift shift requires normally distributed draws")
+
+        # The search runs in double precision, single precision would drown the finite differences. The simulator gets its
+        # params back however the search ends
+        original_params = simulator.simulation_params
+        simulator.simulation_params = {**simulation_params, 'dtype': np.float64}
+        try:
+            dt = simulator.sample_time_increments()
+            n = simulator.sample_dimension()
+            draws_per_step = n // dt.shape[0]
+            scale = np.sqrt(dt / dt.sum())
+
+            def log_payoffs(z):
+                payoffs = self.discounted_payoffs(params, simulator.simulate_from_samples(distribution.mean + distribution.std * z))
+                return np.log(np.maximum(payoffs, 1e-300)), payoffs > 0
+
+            # Each Brownian motion in turn gets a drift of c / sqrt(T) with c on a grid, a shift of norm |c|, the others keeping
+            # the best drift so far. This costs 65 candidate paths per Brownian motion rather than 65^draws_per_step
+            drift = np.zeros(draws_per_step)
+            best = -np.inf
+            for motion in range(draws_per_step):
+                drifts = np.repeat(drift[None, :], 65, axis=0)
+                drifts[:, motion] = np.linspace(-8, 8, 65)
+                values, pays = log_payoffs((drifts[:, None, :] * scale[None, :, None]).reshape(-1, n))
+                values = np.where(pays, values - np.sum(drifts**2, axis=1) / 2, -np.inf)
+                if values.max() > best:
+                    best = values.max()
+                    drift = drifts[np.argmax(values)]
+            if not np.isfinite(best):
+                # Nothing pays anywhere near, the shift cannot be told apart from no shift
+                return np.zeros(n)
+            start = (scale[:, None] * drift[None, :]).reshape(n)
+
+            def objective(z):
+                # All perturbed draws of the central difference gradient are simulated at once
+                h = 1e-5
+                values, _ = log_payoffs(z + np.concatenate([np.zeros((1, n)), h * np.eye(n), -h * np.eye(n)]))
+                gradient = (values[1:n + 1] - values[n + 1:]) / (2 * h) - z
+                return z @ z / 2 - values[0], -gradient
+
+            return minimize(objective, start, jac=True, method='L-BFGS-B').x
+        finally:
+            simulator.simulation_params = original_params
+
+    def discounted_payoffs(self, params: dict, simulated_prices: np.ndarray):
+        raise NotImplementedError(f"{type(self).__name__} does not expose per-path payoffs")
+
+    def payoff_statistics(self, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        # Accumulate the discounted payoffs chunk by chunk, so memory is bounded by the chunk size
+        statistics = RunningStatistics()
+        for samples in self.simulator.sample_chunks(chunk_size, self.simulation_params_for(params, simulation_params)):
+            statistics.update(self.with_controls(params, samples, self.discounted_payoffs(params, self.simulator.simulate_from_samples(samples))))
+        return statistics
+
+    def with_controls(self, params: dict, samples, payoffs):
+        # Control values ride along as extra columns, so chunks and shards merge their joint moments
+        if not self.control_variates:
+            return self.importance_weighted(samples, payoffs)
+        return self.importance_weighted(samples, np.column_stack([payoffs] + [control.values(params, self.simulator, samples)
+                                                                              for control in self.control_variates]))
+
+    def importance_weighted(self, samples, values):
+        # Under a drift shift each path's values are weighted by its likelihood ratio, which keeps all their expectations unbiased
+        ratios = self.simulator.likelihood_ratios(samples)
+        if ratios is None:
+            return values
+        return values * (ratios if np.ndim(values) == 1 else ratios[:, None])
+
+    def estimate(self, params: dict, statistics: RunningStatistics, simulation_params: Optional[dict] = None):
+        # Price and standard error from the payoff statistics. With controls this is the regression estimator, with the
+        # optimal beta = Cov(C)^-1 Cov(C, Y) estimated from the same paths, whose O(1/paths) bias is negligible next to the error
+        if not self.control_variates:
+            return statistics.mean, statistics.standard_error
+
+        if simulation_params is not None:
+            self.simulator.simulation_params = self.simulation_params_for(params, simulation_params)
+        expectations = np.array([control.expectation(params, self.simulator) for control in self.control_variates])
+
+        mean = statistics.mean
+        covariance = statistics.covariance
+        beta = np.linalg.lstsq(covariance[1:, 1:], covariance[1:, 0], rcond=None)[0]
+        price = mean[0] - beta @ (mean[1:] - expectations)
+
+        # The controlled payoff keeps only the part of the payoff variance the controls do not explain
+        variance = max(covariance[0, 0] - covariance[0, 1:] @ beta, 0.0)
+        return price, np.sqrt(variance / statistics.count)
+
+    def price_and_standard_error(self, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        statistics = self.payoff_statistics(params, simulation_params, chunk_size)
+        return self.estimate(params, statistics)
+
+    def price_to_tolerance(self, params: dict, absolute_tolerance: Optional[float] = None, relative_tolerance: Optional[float] = None,
+                           simulation_params: Optional[dict] = None, replicates: int = 8, initial_paths: int = 1024,
+                           max_paths: int = 2**22, chunk_size: Optional[int] = None):
+        # Randomized QMC: independent scrambles of the Sobol sequence give independent estimates, and their spread is an honest
+        # standard error for QMC points, which the within-run variance overstates. Every round doubles each replicate by
+        # extending its own sequence, until the standard error meets the absolute or relative tolerance or max_paths is reached
+        if absolute_tolerance is None and relative_tolerance is None:
+            raise ValueError("An absolute or relative tolerance is required")
+        if replicates < 2:
+            raise ValueError("At least two replicates are needed for a standard error")
+
+        start_time = time.perf_counter()
+        # Resolved once, so an automatic drift shift is not searched for again in every round
+        simulation_params = self.simulation_params_for(params, simulation_params)
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(simulation_params.get('seed')).spawn(replicates)]
+        replicate_statistics = [RunningStatistics() for _ in seeds]
+
+        paths, block = 0, initial_paths
+        while True:
+            for seed, statistics in zip(seeds, replicate_statistics):
+                block_params = {**simulation_params, 'simulation_paths': block, 'seed': seed, 'sample_offset': paths}
+                statistics.merge(self.payoff_statistics(params, block_params, chunk_size))
+            paths += block
+
+            estimates = np.array([self.estimate(params, statistics)[0] for statistics in replicate_statistics])
+            price = estimates.mean()
+            standard_error = estimates.std(ddof=1) / np.sqrt(replicates)
+
+            # No spread at all means no path has paid off yet, not that the price is known
+            target = max(absolute_tolerance or 0.0, (relative_tolerance or 0.0) * np.abs(price))
+            if (0 < standard_error <= target) or 2 * paths * replicates > max_paths:
+                break
+            block = paths
+
+        return price, standard_error, paths * replicates, time.perf_counter() - start_time
+
+    def pathwise_payoffs(self, params: dict, sensitivity_steps):
+        # Discounted payoffs with their pathwise derivatives to the initial price and the volatility, from (prices, dS0, dsigma) steps
+        raise NotImplementedError(f"{type(self).__name__} does not provide pathwise Greeks")
+
+    def option_payoff_sensitivities(self, params: dict, S1, S2, S1_sensitivities, S2_sensitivities):
+        # A call pays max(S1 - S2, 0) and a put max(S2 - S1, 0), the derivative of either is the in-the-money indicator times the leg derivatives
+        T = params['time_to_maturity']
+        r = params['risk_free_rate']
+        option_type = params['option_type']
+        if option_type == 'call':
+            sign = 1.0
+        elif option_type == 'put':
+            sign = -1.0
+        else:
+            raise ValueError("Invalid option type")
+
+        discount_factor = np.exp(-r * T)
+        moneyness = sign * (S1 - S2)
+        in_the_money = discount_factor * sign * (moneyness > 0)
+        return discount_factor * np.maximum(moneyness, 0), [in_the_money * (dS1 - dS2) for dS1, dS2 in zip(S1_sensitivities, S2_sensitivities)]
+
+    def pathwise_gamma(self, params: dict, samples, delta):
+        # Differentiates the pathwise delta through the likelihood ratio of the first step, E[delta_path * (S0 * score - 1)] / S0.
+        # This needs the payoff to depend on S0 only through the simulated prices
+        S0 = self.simulator.simulation_params['initial_stock_price']
+        return delta * (S0 * self.simulator.initial_price_score(samples) - 1) / S0
+
+    def price_and_greeks(self, params: dict, simulation_params: Optional[dict] = None, chunk_size: Optional[int] = None):
+        # Price, delta, gamma and vega from one simulation: delta and vega pathwise, gamma from the likelihood ratio of the pathwise delta
+        simulation_params = self.simulation_params_for(params, simulation_params)
+
+        statistics = RunningStatistics()
+        for samples in self.simulator.sample_chunks(chunk_size, simulation_params):
+            payoffs, (delta, vega) = self.pathwise_payoffs(params, self.simulator.sensitivity_steps_from_samples(samples))
+            gamma = self.pathwise_gamma(params, samples, delta)
+            statistics.update(self.importance_weighted(samples, np.column_stack((payoffs, delta, gamma, vega))))
+
+        names = ('price', 'delta', 'gamma', 'vega')
+        estimates = dict(zip(names, statistics.mean))
+        standard_errors = dict(zip(names, statistics.standard_error))
+        price = estimates.pop('price')
+        return price, estimates, standard_errors
@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class DriftDiffusionKernel(ABC):
+    # Evaluates drift and diffusion of dX = a(t, X) dt + b(t, X) dW into preallocated buffers, so a time step allocates nothing
+
+    def prepare(self, times, dtype):
+        # Called once per simulation with the left end of every time step, time-dependent coefficients can be tabulated here
+        pass
+
+    @abstractmethod
+    def drift(self, step, x, out):
+        pass
+
+    @abstractmethod
+    def diffusion(self, step, x, out):
+        pass
+
+    def euler_step(self, step, x, increment, dt, drift, diffusion):
+        # x += a(t, x) * dt + b(t, x) * dW in place, drift and diffusion are scratch buffers
+        self.drift(step, x, drift)
+        self.diffusion(step, x, diffusion)
+        drift *= dt
+        diffusion *= increment
+        x += drift
+        x += diffusion
+
+    def has_diffusion_derivative(self):
+        return False
+
+    def diffusion_derivative(self, step, x, out):
+        # Derivative of the diffusion with respect to the state, needed by the Milstein scheme
+        raise NotImplementedError(f"{type(self).__name__} does not provide the diffusion derivative")
+
+
+class AffineKernel(DriftDiffusionKernel):
+    # a(t, x) = drift_constant + drift_slope * x and b(t, x) = diffusion_constant + diffusion_slope * x, which covers GBM,
+    # Ornstein-Uhlenbeck and arithmetic Brownian motion. A coefficient is a number, or a function of time vectorized over an array of times
+    def __init__(self, drift_constant=0.0, drift_slope=0.0, diffusion_constant=0.0, diffusion_slope=0.0):
+        self.coefficients = (drift_constant, drift_slope, diffusion_constant, diffusion_slope)
+        self.time_homogeneous = not any(callable(coefficient) for coefficient in self.coefficients)
+        self.table = None
+
+    def prepare(self, times, dtype):
+        # Time-dependent coefficients are evaluated on the whole grid at once, a step only looks them up
+        self.table = [np.broadcast_to(np.asarray(coefficient(times) if callable(coefficient) else coefficient, dtype=dtype), times.shape)
+                      for coefficient in self.coefficients]
+        self.has_constants = np.any(self.table[0] != 0), np.any(self.table[2] != 0)
+
+    def euler_step(self, step, x, increment, dt, drift, diffusion):
+        # Fused as x = x * (1 + drift_slope * dt + diffusion_slope * dW) + drift_constant * dt + diffusion_constant * dW
+        drift_constant, drift_slope, diffusion_constant, diffusion_slope = (coefficient[step] for coefficient in self.table)
+        np.multiply(increment, diffusion_slope, out=drift)
+        drift += 1 + drift_slope * dt
+        x *= drift
+
+        has_drift_constant, has_diffusion_constant = self.has_constants
+        if has_diffusion_constant:
+            np.multiply(increment, diffusion_constant, out=diffusion)
+            x += diffusion
+        if has_drift_constant:
+            x += drift_constant * dt
+
+    def affine(self, constant, slope, step, x, out):
+        np.multiply(x, self.table[slope][step], out=out)
+        out += self.table[constant][step]
+        return out
+
+    def drift(self, step, x, out):
+        return self.affine(0, 1, step, x, out)
+
+    def diffusion(self, step, x, out):
+        return self.affine(2, 3, step, x, out)
+
+    def has_diffusion_derivative(self):
+        return True
+
+    def diffusion_derivative(self, step, x, out):
+        out[...] = self.table[3][step]
+        return out
+
+
+class FunctionKernel(DriftDiffusionKernel):
+    # Drift and diffusion from functions vectorized over the paths (numpy expressions or ufuncs). Time-homogeneous functions take
+    # the state only, time-dependent ones take (t, x)
+    def __init__(self, drift_function, diffusion_function, diffusion_derivative_function=None, time_homogeneous=False):
+        self.drift_function = drift_function
+        self.diffusion_function = diffusion_function
+        self.diffusion_derivative_function = diffusion_derivative_function
+        self.time_homogeneous = time_homogeneous
+        self.times = None
+
+    def prepare(self, times, dtype):
+        self.times = times
+
+    def evaluate(self, function, step, x, out):
+        out[...] = function(x) if self.time_homogeneous else function(self.times[step], x)
+        return out
+
+    def drift(self, step, x, out):
+        return self.evaluate(self.drift_function, step, x, out)
+
+    def diffusion(self, step, x, out):
+        return self.evaluate(self.diffusion_function, step, x, out)
+
+    def has_diffusion_derivative(self):
+        return self.diffusion_derivative_function is not None
+
+    def diffusion_derivative(self, step, x, out):
+        if self.diffusion_derivative_function is None:
+            return super().diffusion_derivative(step, x, out)
+        return self.evaluate(self.diffusion_derivative_function, step, x, out)
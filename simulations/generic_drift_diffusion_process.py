@@ -1,53 +1,106 @@
 import numpy as np
-from scipy.stats.qmc import Sobol
-from scipy.stats import norm
 from simulations.simulation_model import SimulationModel
 from distributions.distribution_model import Distribution
 from distributions.normal_distribution import NormalDistribution
+from simulations.normal_variates import NormalVariateProvider
+from simulations.drift_diffusion_kernels import DriftDiffusionKernel, FunctionKernel
 
 class GenericDriftDiffusionProcess(SimulationModel):
-    def __init__(self, simulation_params: dict, drift_function: callable, diffusion_function: callable):
-        super().__init__(simulation_params)
+    supports_observation_times = True
+
+    def __init__(self, simulation_params: dict = None, drift_function: callable = None, diffusion_function: callable = None, normal_variates: NormalVariateProvider = None,
+                 kernel: DriftDiffusionKernel = None):
+        super().__init__(simulation_params, normal_variates)
         self.drift_function = drift_function
         self.diffusion_function = diffusion_function
+        # Without a kernel the drift and diffusion functions are called as f(t, S) on every step
+        self.kernel = kernel
 
-    def simulate(self, simulation_params: dict):
+    def simulate(self, simulation_params: dict = None):
         if simulation_params is not None:
             self.simulation_params = simulation_params
 
+        simulations = self.simulation_params.get('simulation_paths', 10000)
+        return self.simulate_from_samples(self.quasi_random_samples(simulations))
+
+    def sample_dimension(self):
+        return self.simulation_params.get('time_steps', 1000)
+
+    def simulate_from_samples(self, z):
+        steps = self.simulation_params.get('time_steps', 1000)
+
+        # Only the observed columns are stored, column-major so that every stored step is a contiguous write
+        observed = self.observed_steps(steps)
+        prices = np.empty((observed.shape[0] + 1, z.shape[0]), dtype=self.dtype()).T
+        for column, price in enumerate(self.kernel_steps(z)):
+            prices[:, column] = price
+
+        return prices
+
+    def price_steps_from_samples(self, z):
+        for price in self.kernel_steps(z):
+            yield price.copy()
+
+    def sample_time_increments(self):
+        steps = self.simulation_params.get('time_steps', 1000)
+        return np.full(steps, self.simulation_params['time_to_maturity'] / steps)
+
+    def brownian_increments(self, z):
+        return self.standard_normals(z), self.sample_time_increments()
+
+    def drift_diffusion_kernel(self):
+        if self.kernel is not None:
+            return self.kernel
+        return FunctionKernel(self.drift_function, self.diffusion_function)
+
+    def kernel_steps(self, z):
+        # Generator of the state today and at each observed step. It yields the live buffer, which is only valid until the next step
         S0 = self.simulation_params['initial_stock_price']
         T = self.simulation_params['time_to_maturity']
-        r = self.simulation_params['risk_free_rate']
-        sigma = self.simulation_params['volatility']
-        delta = self.simulation_params.get('dividend_yield', 0.0)
         steps = self.simulation_params.get('time_steps', 1000)
-        simulations = self.simulation_params.get('simulation_paths', 10000)
+        discretization = self.simulation_params.get('discretization', 'euler')
+        dtype = self.dtype()
+
+        kernel = self.drift_diffusion_kernel()
+        if discretization not in ('euler', 'milstein'):
+            raise ValueError("Discretization not recognized")
+        if discretization == 'milstein' and not kernel.has_diffusion_derivative():
+            raise ValueError("The Milstein scheme needs the derivative of the diffusion")
 
         dt = T / steps
-        sqrt_dt = np.sqrt(dt)
-        
-        prices = np.zeros((simulations, steps + 1))
-        prices[:, 0] = S0
-
-        # Generate Sobol sequence
-        sobol = Sobol(d=steps, scramble=True)
-        m = int(np.ceil(np.log2(simulations)))
-        sobol_samples = sobol.random_base2(m=m)
-
-        # Ensure the number of samples matches the number of simulations
-        if sobol_samples.shape[0] > simulations:
-            sobol_samples = sobol_samples[:simulations, :]
-        elif sobol_samples.shape[0] < simulations:
-            raise ValueError("Number of Sobol samples is less than the number of simulations")
-
-        # Transform Sobol samples to standard normal distribution
-        z = self.simulation_params.get('distribution_model', NormalDistribution()).ppf(sobol_samples)
-
-        # Simulate paths
-        for i in range(1, steps + 1):
-            t = i * dt
-            drift = self.drift_function(t, prices[:, i-1])
-            diffusion = self.diffusion_function(t, prices[:, i-1])
-            prices[:, i] = prices[:, i-1] + drift * dt + diffusion * sqrt_dt * z[:, i-1]
-
-        return prices
\ No newline at end of file
+        kernel.prepare(np.arange(steps) * dt, dtype)
+        dt, sqrt_dt = dtype.type(dt), dtype.type(np.sqrt(dt))
+
+        # The current step and the kernel outputs live in preallocated O(paths) buffers, updated in place
+        observed = self.observed_steps(steps)
+        price = np.full(z.shape[0], S0, dtype=dtype)
+        drift = np.empty_like(price)
+        diffusion = np.empty_like(price)
+        increment = np.empty_like(price)
+        correction = np.empty_like(price) if discretization == 'milstein' else None
+        yield price
+
+        column = 1
+        for i in range(observed[-1]):
+            np.multiply(z[:, i], sqrt_dt, out=increment)
+            if correction is None:
+                kernel.euler_step(i, price, increment, dt, drift, diffusion)
+            else:
+                # Milstein adds 0.5 * b * b' * (dW^2 - dt), regrouped as (a - 0.5 * b * b') * dt + (b + 0.5 * b * b' * dW) * dW
+                kernel.drift(i, price, drift)
+                kernel.diffusion(i, price, diffusion)
+                kernel.diffusion_derivative(i, price, correction)
+                correction *= diffusion
+                correction *= dtype.type(0.5)
+                drift -= correction
+                correction *= increment
+                diffusion += correction
+
+                drift *= dt
+                diffusion *= increment
+                price += drift
+                price += diffusion
+
+            if i + 1 == observed[column - 1]:
+                yield price
+                column += 1
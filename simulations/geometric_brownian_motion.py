@@ -1,86 +1,172 @@
 import numpy as np
-from scipy.stats.qmc import Sobol
-from scipy.stats import norm
 from simulations.simulation_model import SimulationModel
 from distributions.normal_distribution import NormalDistribution
 
 class GeometricBrownianMotion(SimulationModel):
+    supports_observation_times = True
+    supports_backward_simulation = True
+
     def simulate(self, simulation_params:dict=None):
         if simulation_params is not None:
             self.simulation_params = simulation_params
 
-        S0 = self.simulation_params['initial_stock_price']
-        T = self.simulation_params['time_to_maturity']
+        simulations = self.simulation_params.get('simulation_paths', 10000)
+        return self.simulate_from_samples(self.quasi_random_samples(simulations))
+
+    def time_increments(self):
+        # The exact transition is sampled directly between observation times, when given
+        times = self.observation_times()
+        if times is not None:
+            return np.diff(times, prepend=0.0)
+
+        steps = self.simulation_params.get('time_steps', 1000)
+        return np.full(steps, self.simulation_params['time_to_maturity'] / steps)
+
+    def sample_dimension(self):
+        return self.time_increments().shape[0]
+
+    def sample_time_increments(self):
+        return self.time_increments()
+
+    def step_coefficients(self):
         r = self.simulation_params['risk_free_rate']
         sigma = self.simulation_params['volatility']
         delta = self.simulation_params.get('dividend_yield', 0.0)
-        steps = self.simulation_params.get('time_steps', 1000)
-        simulations = self.simulation_params.get('simulation_paths', 10000)
+        dtype = self.dtype()
 
-        dt = T / steps
-        drift = (r - delta - 0.5 * sigma**2) * dt
-        diffusion = sigma * np.sqrt(dt)
-        prices = np.zeros((simulations, steps + 1))
-        prices[:, 0] = S0
+        dt = self.time_increments()
+        drift = ((r - delta - 0.5 * sigma**2) * dt).astype(dtype)
+        diffusion = (sigma * np.sqrt(dt)).astype(dtype)
+        return drift, diffusion
 
-        # Generate Sobol sequence
-        sobol = Sobol(d=steps, scramble=True)
-        m = int(np.ceil(np.log2(simulations)))
-        sobol_samples = sobol.random_base2(m=m)
-        
-        # Ensure the number of samples matches the number of simulations
-        if sobol_samples.shape[0] > simulations:
-            sobol_samples = sobol_samples[:simulations, :]
-        elif sobol_samples.shape[0] < simulations:
-            raise ValueError("Number of Sobol samples is less than the number of simulations")
-
-        # Transform Sobol samples to standard normal distribution
-        z = self.simulation_params.get('distribution_model', NormalDistribution()).ppf(sobol_samples)
+    def simulate_from_samples(self, z):
+        S0 = self.simulation_params['initial_stock_price']
+        drift, diffusion = self.step_coefficients()
+        prices = np.zeros((z.shape[0], drift.shape[0] + 1), dtype=self.dtype())
+        prices[:, 0] = S0
 
         prices[:, 1:] = S0 * np.exp(np.cumsum(drift + diffusion * z, axis=1))
         return prices
-    
 
+    def price_steps_from_samples(self, z):
+        S0 = self.simulation_params['initial_stock_price']
+        drift, diffusion = self.step_coefficients()
+        dtype = self.dtype()
 
-class GBMDiscreteStepVolatilities(SimulationModel):
-    def simulate(self, simulation_params: dict = None):
+        # The log price is carried in an O(paths) vector instead of a path matrix
+        log_price = np.zeros(z.shape[0], dtype=dtype)
+        yield np.full(z.shape[0], S0, dtype=dtype)
+        for i in range(drift.shape[0]):
+            log_price += drift[i] + diffusion[i] * z[:, i]
+            yield S0 * np.exp(log_price)
+
+    def sensitivity_steps_from_samples(self, z):
+        S0 = self.simulation_params['initial_stock_price']
+        sigma = self.simulation_params['volatility']
+        drift, diffusion = self.step_coefficients()
+        dtype = self.dtype()
+        dt = self.time_increments()
+        times = np.cumsum(dt)
+
+        # S_t = S0 exp((r - delta - sigma^2 / 2) t + sigma W_t), so dS_t / dS0 = S_t / S0 and dS_t / dsigma = S_t (W_t - sigma t)
+        log_price = np.zeros(z.shape[0], dtype=dtype)
+        brownian_motion = np.zeros(z.shape[0], dtype=dtype)
+        yield np.full(z.shape[0], S0, dtype=dtype), np.ones(z.shape[0], dtype=dtype), np.zeros(z.shape[0], dtype=dtype)
+        for i in range(drift.shape[0]):
+            log_price += drift[i] + diffusion[i] * z[:, i]
+            brownian_motion += dtype.type(np.sqrt(dt[i])) * z[:, i]
+            prices = S0 * np.exp(log_price)
+            yield prices, prices / dtype.type(S0), prices * (brownian_motion - dtype.type(sigma * times[i]))
+
+    def brownian_increments(self, z):
+        return self.standard_normals(z), self.time_increments()
+
+    def reference_volatility(self):
+        return self.simulation_params['volatility']
+
+    def initial_price_score(self, z):
+        # Only the first increment depends on S0 through its starting point. Its draw is Z_1 = (log S_1 - log S0 - drift) / (sigma sqrt(dt_1)),
+        # so the score is -f'(Z_1) / f(Z_1) / (S0 sigma sqrt(dt_1)) for the density f of the draws, Z_1 / (S0 sigma sqrt(dt_1)) for normals
+        S0 = self.simulation_params['initial_stock_price']
+        sigma = self.simulation_params['volatility']
+        return self.sample_distribution().score(np.asarray(z[:, 0], dtype=np.float64)) / (S0 * sigma * np.sqrt(self.time_increments()[0]))
+
+    def simulate_backward(self, simulation_params: dict = None):
         if simulation_params is not None:
             self.simulation_params = simulation_params
 
         S0 = self.simulation_params['initial_stock_price']
         T = self.simulation_params['time_to_maturity']
         r = self.simulation_params['risk_free_rate']
+        sigma = self.simulation_params['volatility']
         delta = self.simulation_params.get('dividend_yield', 0.0)
+        steps = self.simulation_params.get('time_steps', 1000)
+        simulations = self.simulation_params.get('simulation_paths', 10000)
+
+        if not isinstance(self.simulation_params.get('distribution_model', NormalDistribution()), NormalDistribution):
+            raise ValueError("Backward simulation requires normally distributed increments")
+
+        dtype = self.dtype()
+        dt = T / steps
+        drift = r - delta - 0.5 * sigma**2
+        # A 'sample_offset' asks for paths independent of those at offset zero, so it is mixed into the seed
+        seed = self.simulation_params.get('seed')
+        offset = self.simulation_params.get('sample_offset', 0)
+        rng = np.random.default_rng(seed if seed is None or offset == 0 else [seed, offset])
+
+        # Sample the terminal Brownian motion, then walk back along Brownian bridges pinned at W_0 = 0
+        brownian_motion = dtype.type(np.sqrt(T)) * rng.standard_normal(simulations, dtype=dtype)
+        yield steps, S0 * np.exp(dtype.type(drift * T) + dtype.type(sigma) * brownian_motion)
+
+        for k in range(steps - 1, 0, -1):
+            brownian_motion *= dtype.type(k / (k + 1))
+            brownian_motion += dtype.type(np.sqrt(k * dt / (k + 1))) * rng.standard_normal(simulations, dtype=dtype)
+            yield k, S0 * np.exp(dtype.type(drift * k * dt) + dtype.type(sigma) * brownian_motion)
+
+        yield 0, np.full(simulations, S0, dtype=dtype)
+    
+
+
+class GBMDiscreteStepVolatilities(SimulationModel):
+    def simulate(self, simulation_params: dict = None):
+        if simulation_params is not None:
+            self.simulation_params = simulation_params
+
         simulations = self.simulation_params.get('simulation_paths', 10000)
+        return self.simulate_from_samples(self.quasi_random_samples(simulations))
 
+    def sample_dimension(self):
+        # Volatilities are assumed to be equally spaced
+        return self.volatilities().shape[0]
+
+    def sample_time_increments(self):
+        steps = self.sample_dimension()
+        return np.full(steps, self.simulation_params['time_to_maturity'] / steps)
+
+    def volatilities(self):
         volatilities = self.simulation_params.get('volatilities', None)
         if volatilities is None:
             raise ValueError("Volatilities must be provided")
+        return volatilities
+
+    def simulate_from_samples(self, z):
+        S0 = self.simulation_params['initial_stock_price']
+        T = self.simulation_params['time_to_maturity']
+        r = self.simulation_params['risk_free_rate']
+        delta = self.simulation_params.get('dividend_yield', 0.0)
+        dtype = self.dtype()
+        volatilities = self.volatilities()
 
-        # Volatilities are assumed to be equally spaced
         steps = volatilities.shape[0]
         dt = T / steps
-        prices = np.zeros((simulations, steps + 1))
+        prices = np.zeros((z.shape[0], steps + 1), dtype=dtype)
         prices[:, 0] = S0
 
-        sobol = Sobol(d=steps, scramble=True)
-        m = int(np.ceil(np.log2(simulations)))
-        sobol_samples = sobol.random_base2(m=m)
-
-        # Ensure the number of samples matches the number of simulations
-        if sobol_samples.shape[0] > simulations:
-            sobol_samples = sobol_samples[:simulations, :]
-        elif sobol_samples.shape[0] < simulations:
-            raise ValueError("Number of Sobol samples is less than the number of simulations")
-
-        z = self.simulation_params.get('distribution_model', NormalDistribution()).ppf(sobol_samples)
-
-        drift = (r - delta - 0.5 * volatilities**2) * dt
-        diffusion = volatilities * np.sqrt(dt)
+        drift = ((r - delta - 0.5 * volatilities**2) * dt).astype(dtype)
+        diffusion = (volatilities * np.sqrt(dt)).astype(dtype)
 
         # Calculate the price paths
         log_returns = np.cumsum(drift + diffusion * z, axis=1)
         prices[:, 1:] = S0 * np.exp(log_returns)
 
         return prices
-
@@ -1,10 +1,10 @@
 import numpy as np
-from scipy.stats.qmc import Sobol
-from scipy.stats import norm
 from simulations.simulation_model import SimulationModel
 from distributions.normal_distribution import NormalDistribution
+from scipy.special import ndtr
 
 class HestonProcess(SimulationModel):
+    supports_observation_times = True
 
     def simulate(self, simulation_params: dict = None):
         prices, variances = self.simulate_prices_and_variances(simulation_params)
@@ -14,42 +14,100 @@ class HestonProcess(SimulationModel):
         if simulation_params is not None:
             self.simulation_params = simulation_params
 
+        simulations = self.simulation_params['simulation_paths']
+        return self.prices_and_variances_from_samples(self.quasi_random_samples(simulations))
+
+    def sample_dimension(self):
+        # One draw for the variance and one for the price per step
+        return 2 * self.simulation_params['time_steps']
+
+    def sample_time_increments(self):
+        # Both discretizations step on the uniform grid, observation times only select the stored columns
+        steps = self.simulation_params['time_steps']
+        return np.full(steps, self.simulation_params['time_to_maturity'] / steps)
+
+    def sample_distribution(self):
+        return NormalDistribution()
+
+    def simulate_from_samples(self, samples):
+        prices, variances = self.prices_and_variances_from_samples(samples)
+        return prices
+
+    def prices_and_variances_from_samples(self, norm_samples):
+        steps = self.simulation_params['time_steps']
+        dtype = self.dtype()
+
+        # Only the observed columns are stored
+        observed = self.observed_steps(steps)
+        prices = np.empty((norm_samples.shape[0], observed.shape[0] + 1), dtype=dtype)
+        variances = np.empty((norm_samples.shape[0], observed.shape[0] + 1), dtype=dtype)
+        for column, (price, variance) in enumerate(self.price_and_variance_steps(norm_samples)):
+            prices[:, column] = price
+            variances[:, column] = variance
+
+        return prices, variances
+
+    def price_steps_from_samples(self, samples):
+        for price, variance in self.price_and_variance_steps(samples):
+            yield price
+
+    def brownian_increments(self, norm_samples):
+        # Brownian increments of the log price on the uniform grid, rho * Z_variance + sqrt(1 - rho^2) * Z_price. Euler uses exactly
+        # this shock. The quadratic-exponential scheme draws the price with the independent Z_price only, and the correlation
+        # enters through the variance terms K1 v + K2 v', about (rho / volvol) times the integral of sqrt(v) dW_variance. The next
+        # variance is monotone in Z_variance, so the combination is still the shock that scheme's price follows to leading order.
+        # Z_price alone would drop the correlated part of the price's dependence on the draws
+        rho = self.simulation_params['rho']
+        steps = self.simulation_params['time_steps']
+        norm_samples = norm_samples.reshape(norm_samples.shape[0], steps, 2)
+        normals = rho * norm_samples[:, :, 0] + np.sqrt(1 - rho**2) * norm_samples[:, :, 1]
+        return normals, self.sample_time_increments()
+
+    def reference_volatility(self):
+        # Root of the expected average variance over the life of the option
+        T = self.simulation_params['time_to_maturity']
+        v0 = self.simulation_params['initial_variance']
+        kappa = self.simulation_params['kappa']
+        theta = self.simulation_params['theta']
+        return np.sqrt(theta + (v0 - theta) * (1 - np.exp(-kappa * T)) / (kappa * T))
+
+    def price_and_variance_steps(self, norm_samples):
+        # Generator of the price and variance vectors today and at each observed step, the current step is kept in O(paths) vectors
+        discretization = self.simulation_params.get('discretization', 'euler')
+        if discretization == 'euler':
+            return self.euler_steps(norm_samples)
+        elif discretization == 'quadratic_exponential':
+            return self.quadratic_exponential_steps(norm_samples)
+        else:
+            raise ValueError("Discretization not recognized")
+
+    def euler_steps(self, norm_samples):
+        # Full truncation Euler, which needs small steps to keep the bias down
         S0 = self.simulation_params['initial_stock_price']
         T = self.simulation_params['time_to_maturity']
         r = self.simulation_params['risk_free_rate']
         v0 = self.simulation_params['initial_variance']
         steps = self.simulation_params['time_steps']
-        simulations = self.simulation_params['simulation_paths']
         kappa = self.simulation_params['kappa']
         theta = self.simulation_params['theta']
         volvol = self.simulation_params['volvol']
         rho = self.simulation_params['rho']
 
-        dt = T / steps
-        sqrt_dt = np.sqrt(dt)
-
-        prices = np.zeros((simulations, steps + 1))
-        variances = np.zeros((simulations, steps + 1))
-        prices[:, 0] = S0
-        variances[:, 0] = v0
+        dtype = self.dtype()
+        r, kappa, theta, volvol = (dtype.type(x) for x in (r, kappa, theta, volvol))
 
-        # Generate Sobol sequence for 2*steps dimensions
-        sobol = Sobol(d=2*steps, scramble=True)
-        m = int(np.ceil(np.log2(simulations)))
-        sobol_samples = sobol.random_base2(m=m)
-
-        # Ensure the Sobol samples match the number of simulations
-        if sobol_samples.shape[0] > simulations:
-            sobol_samples = sobol_samples[:simulations, :]
-        elif sobol_samples.shape[0] < simulations:
-            raise ValueError("Number of Sobol samples is less than the number of simulations")
+        simulations = norm_samples.shape[0]
+        dt = dtype.type(T / steps)
+        sqrt_dt = np.sqrt(dt)
 
-        # Transform Sobol samples to normal samples
-        norm_samples = norm.ppf(sobol_samples)
+        observed = self.observed_steps(steps)
+        price = np.full(simulations, S0, dtype=dtype)
+        variance = np.full(simulations, v0, dtype=dtype)
+        yield price, variance
 
         # Perform Cholesky decomposition for the correlation
         correlation_matrix = np.array([[1, rho], [rho, 1]])
-        L = np.linalg.cholesky(correlation_matrix)
+        L = np.linalg.cholesky(correlation_matrix).astype(dtype)
 
         # Reshape norm_samples to (simulations, steps, 2)
         norm_samples = norm_samples.reshape(simulations, steps, 2)
@@ -57,25 +115,91 @@ class HestonProcess(SimulationModel):
         # Generate correlated samples for each step
         correlated_samples = np.einsum('ij,klj->kli', L, norm_samples)
 
-        # mu = np.array([0,0])
-        # cov = np.array([[1,rho],[rho,1]])
-
-        # correlated_samples = np.random.multivariate_normal(mu, cov, (simulations, steps))
-
-        
         # Iterate over time steps to simulate the Heston model
-        for t in range(1, steps + 1):
+        column = 1
+        for t in range(1, observed[-1] + 1):
             Z1 = correlated_samples[:, t-1, 0]
             Z2 = correlated_samples[:, t-1, 1]
+            volatility = np.sqrt(variance)
+
+            # Update stock price process
+            price = price * np.exp((r - 0.5 * variance) * dt + volatility * sqrt_dt * Z2)
 
             # Update variance process
-            variances[:, t] = np.maximum(variances[:, t-1] +
-                               kappa * (theta - variances[:, t-1]) * dt +
-                               volvol * np.sqrt(variances[:, t-1]) * sqrt_dt * Z1, 0)
+            variance = np.maximum(variance + kappa * (theta - variance) * dt + volvol * volatility * sqrt_dt * Z1, 0)
 
-            # Update stock price process
-            prices[:, t] = (prices[:, t-1] *
-                            np.exp((r - 0.5 * variances[:, t-1]) * dt +
-                                   np.sqrt(variances[:, t-1]) * sqrt_dt * Z2))
+            if t == observed[column - 1]:
+                yield price, variance
+                column += 1
 
-        return prices, variances
+    def quadratic_exponential_steps(self, norm_samples):
+        # Andersen's quadratic-exponential scheme: the next variance is drawn from a law matching the exact conditional mean and variance,
+        # the log price from its distribution given both variances, so far fewer steps are needed for the same bias
+        S0 = self.simulation_params['initial_stock_price']
+        T = self.simulation_params['time_to_maturity']
+        r = self.simulation_params['risk_free_rate']
+        v0 = self.simulation_params['initial_variance']
+        steps = self.simulation_params['time_steps']
+        kappa = self.simulation_params['kappa']
+        theta = self.simulation_params['theta']
+        volvol = self.simulation_params['volvol']
+        rho = self.simulation_params['rho']
+        critical_psi = self.simulation_params.get('critical_psi', 1.5)
+
+        dtype = self.dtype()
+        simulations = norm_samples.shape[0]
+        dt = T / steps
+
+        # Coefficients of the conditional variance moments and of the log price step, with equal weights on both ends of the step
+        decay = np.exp(-kappa * dt)
+        variance_coefficients = [theta * (1 - decay), decay, volvol**2 * decay * (1 - decay) / kappa, theta * volvol**2 * (1 - decay)**2 / (2 * kappa)]
+        K1 = 0.5 * dt * (kappa * rho / volvol - 0.5) - rho / volvol
+        K2 = 0.5 * dt * (kappa * rho / volvol - 0.5) + rho / volvol
+        K3 = 0.5 * dt * (1 - rho**2)
+        A = K2 + 0.5 * K3
+        mean_constant, mean_slope, variance_slope, variance_constant, K1, K2, K3, A, drift, critical_psi = (
+            dtype.type(x) for x in (*variance_coefficients, K1, K2, K3, A, r * dt, critical_psi))
+
+        observed = self.observed_steps(steps)
+        log_price = np.zeros(simulations, dtype=dtype)
+        variance = np.full(simulations, v0, dtype=dtype)
+        yield np.full(simulations, S0, dtype=dtype), variance
+
+        norm_samples = norm_samples.reshape(simulations, steps, 2)
+
+        column = 1
+        for t in range(1, observed[-1] + 1):
+            z_variance = norm_samples[:, t-1, 0]
+            z_price = norm_samples[:, t-1, 1]
+
+            mean = mean_constant + mean_slope * variance
+            psi = (variance_constant + variance_slope * variance) / mean**2
+            quadratic = psi <= critical_psi
+
+            # Both branches are evaluated on every path, the rows of the branch not taken are discarded
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                # Low psi: a scaled non-central chi-square with one degree of freedom
+                two_over_psi = 2 / psi
+                b2 = two_over_psi - 1 + np.sqrt(two_over_psi) * np.sqrt(np.maximum(two_over_psi - 1, 0))
+                a = mean / (1 + b2)
+
+                # High psi: a point mass at zero mixed with an exponential, inverted from the same normal draw
+                p = (psi - 1) / (psi + 1)
+                beta = (1 - p) / mean
+                uniform = ndtr(z_variance)
+                exponential_variance = np.where(uniform <= p, 0, np.log((1 - p) / (1 - uniform)) / beta)
+                next_variance = np.where(quadratic, a * (np.sqrt(b2) + z_variance)**2, exponential_variance).astype(dtype, copy=False)
+
+                # Martingale correction: the log of E[exp(A * next_variance)] replaces the constant drift term,
+                # falling back to no correction where that moment does not exist
+                log_moment = np.where(quadratic, A * b2 * a / (1 - 2 * A * a) - 0.5 * np.log(1 - 2 * A * a),
+                                      np.log(p + beta * (1 - p) / (beta - A)))
+            uncorrected = dtype.type(-rho * kappa * theta * dt / volvol) + (K1 + 0.5 * K3) * variance
+            log_moment = np.where(np.isfinite(log_moment), log_moment, -uncorrected)
+
+            log_price += drift - log_moment - 0.5 * K3 * variance + K2 * next_variance + np.sqrt(K3 * (variance + next_variance)) * z_price
+            variance = next_variance
+
+            if t == observed[column - 1]:
+                yield S0 * np.exp(log_price), variance
+                column += 1
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import threading
+import warnings
+import numpy as np
+from scipy.stats.qmc import Sobol
+from distributions.distribution_model import Distribution
+
+
+class NormalVariateProvider:
+    # Quasi-random draws transformed by a distribution's ppf (the standard normal unless a simulator
+    # is given another distribution model), cached so that repeated pricings of the same contract set
+    # skip both the Sobol generation and the inverse CDF
+    def __init__(self, max_cache_bytes: int = 2**30, max_engines: int = 256):
+        self.max_cache_bytes = max_cache_bytes
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.max_engines = max_engines
+        self.engines = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Copies of a simulator keep sharing the provider and its cache
+        return self
+
+    def __reduce__(self):
+        # Worker processes start with an empty cache of their own
+        return (NormalVariateProvider, (self.max_cache_bytes, self.max_engines))
+
+    def distribution_key(self, distribution: Distribution):
+        return (type(distribution).__name__, tuple(sorted(vars(distribution).items())))
+
+    def sobol_engine(self, dimension, seed, offset):
+        # Seeded engines are kept where their last block ended, so consecutive blocks of a sequence continue from there
+        # instead of fast-forwarding from the start, which takes time linear in the offset
+        if seed is not None:
+            with self.lock:
+                sobol = self.engines.pop((dimension, seed, offset), None)
+            if sobol is not None:
+                return sobol
+
+        sobol = Sobol(d=dimension, scramble=True, seed=seed)
+        if offset > 0:
+            sobol.fast_forward(offset)
+        return sobol
+
+    def generate(self, dimension, count, distribution: Distribution, seed=None, offset=0, dtype=np.float64):
+        sobol = self.sobol_engine(dimension, seed, offset)
+
+        with warnings.catch_warnings():
+            # Exactly the requested number of points, rather than the next power of two
+            warnings.simplefilter('ignore', UserWarning)
+            uniforms = sobol.random(count)
+
+        if seed is not None:
+            with self.lock:
+                self.engines[(dimension, seed, offset + count)] = sobol
+                while len(self.engines) > self.max_engines:
+                    self.engines.popitem(last=False)
+
+        # A scrambled point can land exactly on 0, whose quantile is infinite, so it is moved half a grid cell in
+        np.maximum(uniforms, 0.5**(sobol.bits + 1), out=uniforms)
+
+        # The inverse CDF is always evaluated in double precision
+        return distribution.ppf(uniforms).astype(dtype, copy=False)
+
+    def samples(self, dimension, count, distribution: Distribution, seed=None, offset=0, cache=True, dtype=np.float64):
+        # Unseeded scrambles are random by design and never reused
+        if seed is None or not cache:
+            return self.generate(dimension, count, distribution, seed, offset, dtype)
+
+        key = (dimension, count, seed, offset, self.distribution_key(distribution), np.dtype(dtype).name)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        samples = self.generate(dimension, count, distribution, seed, offset, dtype)
+        # Cached blocks are shared between simulators, so they must not be modified in place
+        samples.flags.writeable = False
+
+        with self.lock:
+            if key not in self.cache and samples.nbytes <= self.max_cache_bytes:
+                self.cache[key] = samples
+                self.cache_bytes += samples.nbytes
+
+                # Evict the least recently used blocks
+                while self.cache_bytes > self.max_cache_bytes:
+                    _, evicted = self.cache.popitem(last=False)
+                    self.cache_bytes -= evicted.nbytes
+
+        return samples
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.cache_bytes = 0
+            self.engines.clear()
+
+
+default_normal_variate_provider = NormalVariateProvider()
@@ -1,4 +1,8 @@
+import numpy as np
+from scipy.signal import lfilter
 from simulations.generic_drift_diffusion_process import GenericDriftDiffusionProcess
+from simulations.normal_variates import NormalVariateProvider
+from simulations.drift_diffusion_kernels import AffineKernel
 
 
 class OrnsteinUhlenbeckProcess(GenericDriftDiffusionProcess):
@@ -9,9 +13,91 @@ class OrnsteinUhlenbeckProcess(GenericDriftDiffusionProcess):
         return self.sigma
 
 
-    def __init__(self, simulation_params, kappa, theta, sigma):
-        super().__init__(simulation_params, self.drift_function, self.diffusion_function)
+    def __init__(self, simulation_params, kappa, theta, sigma, normal_variates: NormalVariateProvider = None):
+        # The Euler scheme runs on an affine kernel, a(x) = kappa * theta - kappa * x and b(x) = sigma
+        super().__init__(simulation_params, self.drift_function, self.diffusion_function, normal_variates,
+                         AffineKernel(kappa * theta, -kappa, sigma))
         self.kappa = kappa
         self.theta = theta
         self.sigma = sigma
 
+    def is_exact(self):
+        # The Gaussian transition is sampled exactly unless 'discretization' asks for the Euler scheme of the generic process
+        discretization = self.simulation_params.get('discretization', 'exact')
+        if discretization not in ('exact', 'euler'):
+            raise ValueError("Discretization not recognized")
+        return discretization == 'exact'
+
+    def time_increments(self):
+        # The exact transition jumps straight between observation times, when given
+        times = self.observation_times()
+        if times is not None:
+            return np.diff(times, prepend=0.0)
+
+        steps = self.simulation_params.get('time_steps', 1000)
+        return np.full(steps, self.simulation_params['time_to_maturity'] / steps)
+
+    def sample_dimension(self):
+        if not self.is_exact():
+            return super().sample_dimension()
+        return self.time_increments().shape[0]
+
+    def sample_time_increments(self):
+        if not self.is_exact():
+            return super().sample_time_increments()
+        return self.time_increments()
+
+    def transition_coefficients(self):
+        # X(t + dt) - theta = decay * (X(t) - theta) + scale * Z
+        dt = self.time_increments()
+        decay = np.exp(-self.kappa * dt)
+        if self.kappa == 0:
+            scale = self.sigma * np.sqrt(dt)
+        else:
+            scale = self.sigma * np.sqrt((1 - decay**2) / (2 * self.kappa))
+        return decay, scale
+
+    def brownian_increments(self, z):
+        # The exact transition shocks are standard normal as well, one per step of the exact grid
+        if not self.is_exact():
+            return super().brownian_increments(z)
+        return z, self.time_increments()
+
+    def simulate_from_samples(self, z):
+        if not self.is_exact():
+            return super().simulate_from_samples(z)
+
+        S0 = self.simulation_params['initial_stock_price']
+        dtype = self.dtype()
+        decay, scale = self.transition_coefficients()
+
+        prices = np.empty((z.shape[0], decay.shape[0] + 1), dtype=dtype)
+        prices[:, 0] = S0
+        if not np.allclose(decay, decay[0]):
+            # Uneven observation times, few columns, stepped one at a time
+            for column, price in enumerate(self.price_steps_from_samples(z)):
+                prices[:, column] = price
+            return prices
+
+        # On a uniform grid the deviations from theta follow a first order linear recurrence, filtered over all steps at once
+        shocks = (scale[0] * z).astype(dtype, copy=False)
+        initial_state = np.full((z.shape[0], 1), decay[0] * (S0 - self.theta), dtype=dtype)
+        deviations, _ = lfilter(np.ones(1, dtype=dtype), np.array([1, -decay[0]], dtype=dtype), shocks, axis=1, zi=initial_state)
+        prices[:, 1:] = deviations + dtype.type(self.theta)
+        return prices
+
+    def price_steps_from_samples(self, z):
+        if not self.is_exact():
+            yield from super().price_steps_from_samples(z)
+            return
+
+        S0 = self.simulation_params['initial_stock_price']
+        dtype = self.dtype()
+        decay, scale = self.transition_coefficients()
+
+        deviation = np.full(z.shape[0], S0 - self.theta, dtype=dtype)
+        yield deviation + dtype.type(self.theta)
+        for i in range(decay.shape[0]):
+            deviation *= dtype.type(decay[i])
+            deviation += dtype.type(scale[i]) * z[:, i]
+            yield deviation + dtype.type(self.theta)
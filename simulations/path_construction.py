@@ -0,0 +1,87 @@
+from abc import ABC, abstractmethod
+from collections import deque
+import numpy as np
+
+
+class PathConstruction(ABC):
+    # Maps independent standard normals, ordered from the most to the least important, to the standardized increments of
+    # Brownian motions on a time grid. Quasi-random sequences are best spread in their first coordinates, so handing those to
+    # the directions carrying most of the path's variance lowers the effective dimension of the payoff
+    def __init__(self, time_increments):
+        self.time_increments = np.asarray(time_increments, dtype=np.float64)
+        self.times = np.cumsum(self.time_increments)
+
+    @abstractmethod
+    def brownian_motion(self, z):
+        # Brownian motion at every grid time from a (paths, steps, motions) block of normals, the step axis in order of importance
+        pass
+
+    def increments(self, z):
+        # The construction is orthogonal, so the standardized increments are independent standard normals again
+        brownian_motion = self.brownian_motion(z)
+        increments = np.diff(brownian_motion, axis=1, prepend=0.0)
+        increments /= np.sqrt(self.time_increments)[:, None]
+        return increments
+
+
+class BrownianBridgeConstruction(PathConstruction):
+    # The first normal sets the terminal value, the next ones the midpoints of the intervals pinned so far, level by level,
+    # each from the Brownian bridge between its two neighbours. A path costs O(steps)
+    def __init__(self, time_increments):
+        super().__init__(time_increments)
+        times = np.concatenate([[0.0], self.times])
+        steps = self.time_increments.shape[0]
+
+        # Breadth first over the bisection tree, (point, left neighbour, right neighbour) in the order the normals are used
+        self.points = [(steps, 0, None)]
+        intervals = deque([(0, steps)])
+        while intervals:
+            left, right = intervals.popleft()
+            if right - left < 2:
+                continue
+            middle = (left + right) // 2
+            self.points.append((middle, left, right))
+            intervals.extend([(left, middle), (middle, right)])
+
+        self.weights = []
+        for point, left, right in self.points:
+            if right is None:
+                self.weights.append((0.0, 0.0, np.sqrt(times[point])))
+                continue
+            span = times[right] - times[left]
+            self.weights.append(((times[right] - times[point]) / span, (times[point] - times[left]) / span,
+                                 np.sqrt((times[point] - times[left]) * (times[right] - times[point]) / span)))
+
+    def brownian_motion(self, z):
+        # Built time-major so every point is a contiguous row, row 0 holds W(0) = 0 and the grid times follow
+        z = np.ascontiguousarray(np.moveaxis(z, 1, 0), dtype=np.float64)
+        brownian_motion = np.zeros((z.shape[0] + 1, *z.shape[1:]), dtype=np.float64)
+        for k, ((point, left, right), (left_weight, right_weight, scale)) in enumerate(zip(self.points, self.weights)):
+            row = brownian_motion[point]
+            np.multiply(z[k], scale, out=row)
+            if right is not None:
+                row += left_weight * brownian_motion[left]
+                row += right_weight * brownian_motion[right]
+        return np.moveaxis(brownian_motion[1:], 0, 1)
+
+
+class PrincipalComponentConstruction(PathConstruction):
+    # The normals weight the eigenvectors of the covariance min(s, t) of the Brownian motion on the grid, largest eigenvalue first.
+    # This captures the most variance in the fewest coordinates, but a path costs O(steps^2)
+    def __init__(self, time_increments):
+        super().__init__(time_increments)
+        eigenvalues, eigenvectors = np.linalg.eigh(np.minimum.outer(self.times, self.times))
+        order = np.argsort(eigenvalues)[::-1]
+        self.factors = eigenvectors[:, order] * np.sqrt(np.maximum(eigenvalues[order], 0))
+
+    def brownian_motion(self, z):
+        # One product over all paths and motions, (paths * motions, steps) times the transposed factors
+        paths, steps, motions = z.shape
+        flat = np.asarray(z, dtype=np.float64).transpose(0, 2, 1).reshape(-1, steps)
+        return (flat @ self.factors.T).reshape(paths, motions, steps).transpose(0, 2, 1)
+
+
+path_constructions = {
+    'brownian_bridge': BrownianBridgeConstruction,
+    'pca': PrincipalComponentConstruction,
+}
@@ -1,10 +1,245 @@
 from abc import ABC, abstractmethod
+import numpy as np
+from scipy.stats import norm
 from distributions.distribution_model import Distribution
+from distributions.normal_distribution import NormalDistribution
+from simulations.normal_variates import NormalVariateProvider, default_normal_variate_provider
+from simulations.path_construction import path_constructions
 
 class SimulationModel(ABC):
-    def __init__(self, simulation_params: dict=None):
+    # Whether the simulator can return only the columns at requested 'observation_times'
+    supports_observation_times = False
+    # Whether the simulator can regenerate its prices from maturity back to today with simulate_backward
+    supports_backward_simulation = False
+
+    def __init__(self, simulation_params: dict=None, normal_variates: NormalVariateProvider=None):
         self.simulation_params = simulation_params
+        # Simulators share the default provider, and with it its cache, unless given their own
+        self.normal_variates = normal_variates
+        # The construction of the last time grid, rebuilt when the grid or the 'path_construction' changes
+        self.construction = None
+        self.construction_key = None
 
     @abstractmethod
     def simulate(self, simulation_params: dict):
         pass
+
+    def sample_dimension(self):
+        # Number of random draws each path consumes
+        raise NotImplementedError(f"{type(self).__name__} does not expose its sample dimension")
+
+    def simulate_from_samples(self, samples):
+        # Build price paths from a (paths, sample_dimension) block of draws from the sample distribution
+        raise NotImplementedError(f"{type(self).__name__} does not support simulating from samples")
+
+    def sample_time_increments(self):
+        # Time step of each group of consecutive draws, for simulators whose draws drive Brownian increments step by step
+        raise NotImplementedError(f"{type(self).__name__} does not expose the time grid of its draws")
+
+    def sample_distribution(self) -> Distribution:
+        return self.simulation_params.get('distribution_model', NormalDistribution())
+
+    def observation_times(self):
+        # Times in (0, T] at which prices are needed, None when every time step is needed
+        times = self.simulation_params.get('observation_times')
+        if times is None:
+            return None
+
+        times = np.asarray(times, dtype=np.float64)
+        T = self.simulation_params['time_to_maturity']
+        if times.ndim != 1 or times.size == 0 or times[0] <= 0 or times[-1] > T * (1 + 1e-12) or np.any(np.diff(times) <= 0):
+            raise ValueError("Observation times must be increasing and lie in (0, T]")
+        return times
+
+    def observed_steps(self, steps):
+        # Indices of the observed steps for simulators that step on a uniform grid
+        times = self.observation_times()
+        if times is None:
+            return np.arange(1, steps + 1)
+
+        dt = self.simulation_params['time_to_maturity'] / steps
+        indices = np.rint(times / dt).astype(int)
+        if not np.allclose(indices * dt, times):
+            raise ValueError("Observation times must lie on the time step grid")
+        return indices
+
+    def dtype(self):
+        # Paths can be simulated in single precision to halve memory traffic
+        return np.dtype(self.simulation_params.get('dtype', np.float64))
+
+    def variate_provider(self):
+        return self.normal_variates if self.normal_variates is not None else default_normal_variate_provider
+
+    def quasi_random_samples(self, simulations, offset=0, seed=None):
+        # A 'seed' makes the scramble reproducible (and the draws cacheable), a 'sample_offset' skips to a disjoint block of the sequence
+        if seed is None:
+            seed = self.simulation_params.get('seed')
+        offset += self.simulation_params.get('sample_offset', 0)
+        distribution = self.sample_distribution()
+        dtype = self.dtype()
+
+        def draw(count, offset):
+            return self.variate_provider().samples(self.sample_dimension(), count, distribution, seed, offset,
+                                                   cache=self.simulation_params.get('seed') is not None, dtype=dtype)
+
+        if self.simulation_params.get('antithetic', False):
+            # Path 2k + 1 mirrors path 2k around the centre of the (symmetric) sample distribution. Pairing on the global path
+            # index keeps chunks and shards of any size disjoint, with a pair split across two chunks still mirrored.
+            # Pairs are only counted as independent paths by the running statistics, which overstates the standard error
+            first_pair = offset // 2
+            samples = draw((offset + simulations + 1) // 2 - first_pair, first_pair)
+            pairs = np.stack([samples, dtype.type(2 * distribution.ppf(0.5)) - samples], axis=1).reshape(-1, *samples.shape[1:])
+            samples = pairs[offset - 2 * first_pair:][:simulations]
+        else:
+            samples = draw(simulations, offset)
+
+        samples = self.construct_paths(samples, distribution)
+        if self.simulation_params.get('moment_matching', False):
+            samples = self.match_moments(samples, distribution)
+        return self.shift_samples(samples, distribution)
+
+    def drift_shift(self):
+        # 'drift_shift' moves the mean of every standardized draw, one value per draw or one for all of them. Since the draws
+        # are the Brownian increments, this adds a drift to the Brownian motions. None without a shift
+        shift = self.simulation_params.get('drift_shift')
+        if shift is None:
+            return None
+        return np.broadcast_to(np.asarray(shift, dtype=np.float64), (self.sample_dimension(),))
+
+    def shift_samples(self, samples, distribution):
+        # Importance sampling: the draws come from the normal with the shifted mean, and the pricers weight each path by its likelihood ratio
+        shift = self.drift_shift()
+        if shift is None:
+            return samples
+        if not isinstance(distribution, NormalDistribution):
+            raise ValueError("A drift shift requires normally distributed draws")
+        return (samples + distribution.std * shift).astype(samples.dtype, copy=False)
+
+    def likelihood_ratios(self, samples):
+        # Density of the shifted draws without the shift over their density with it, exp(|mu|^2 / 2 - mu . z) for standardized
+        # draws z and shift mu. None without a shift
+        shift = self.drift_shift()
+        if shift is None:
+            return None
+        return np.exp(shift @ shift / 2 - np.asarray(self.standard_normals(samples), dtype=np.float64) @ shift)
+
+    def path_construction(self):
+        # 'path_construction' is 'incremental' (Sobol coordinate i drives step i), 'brownian_bridge' or 'pca'
+        name = self.simulation_params.get('path_construction', 'incremental')
+        if name == 'incremental':
+            return None
+        if name not in path_constructions:
+            raise ValueError("Path construction not recognized")
+
+        time_increments = self.sample_time_increments()
+        key = (name, time_increments.tobytes())
+        if key != self.construction_key:
+            self.construction = path_constructions[name](time_increments)
+            self.construction_key = key
+        return self.construction
+
+    def construct_paths(self, samples, distribution):
+        # Turns the draws, in order of importance, into the increments the simulator steps with. With several draws per step,
+        # each Brownian motion is built from every draws_per_step-th coordinate, so all of them get good coordinates
+        construction = self.path_construction()
+        if construction is None:
+            return samples
+        if not isinstance(distribution, NormalDistribution):
+            raise ValueError("Brownian bridge and PCA constructions require normally distributed draws")
+
+        steps = construction.time_increments.shape[0]
+        draws_per_step, remainder = divmod(samples.shape[1], steps)
+        if remainder or draws_per_step == 0:
+            raise ValueError("The draws do not match the time grid of the path construction")
+
+        z = (np.asarray(samples, dtype=np.float64).reshape(samples.shape[0], steps, draws_per_step) - distribution.mean) / distribution.std
+        increments = construction.increments(z) * distribution.std + distribution.mean
+        return increments.reshape(samples.shape).astype(samples.dtype, copy=False)
+
+    def match_moments(self, samples, distribution):
+        # Every dimension of the block is shifted and scaled to the exact mean and standard deviation. This is done per chunk,
+        # and biases the estimate by O(1 / chunk_size)
+        if not isinstance(distribution, NormalDistribution):
+            raise ValueError("Moment matching requires normally distributed draws")
+        if samples.shape[0] < 2:
+            return samples
+
+        mean = samples.mean(axis=0, dtype=np.float64)
+        std = samples.std(axis=0, dtype=np.float64)
+        return ((samples - mean) * (distribution.std / std) + distribution.mean).astype(samples.dtype, copy=False)
+
+    def sample_chunks(self, chunk_size: int = None, simulation_params: dict = None):
+        # Generator of sample blocks of at most chunk_size paths, so peak memory is bounded by the chunk size
+        if simulation_params is not None:
+            self.simulation_params = simulation_params
+
+        simulations = self.simulation_params.get('simulation_paths', 10000)
+        if chunk_size is None:
+            chunk_size = simulations
+
+        # Consecutive blocks of one Sobol sequence keep the QMC structure across chunks, so all chunks need the same scramble
+        seed = self.simulation_params.get('seed')
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+
+        for start in range(0, simulations, chunk_size):
+            yield self.quasi_random_samples(min(chunk_size, simulations - start), start, seed)
+
+    def simulate_chunks(self, chunk_size: int = None, simulation_params: dict = None):
+        # Generator of path blocks
+        for samples in self.sample_chunks(chunk_size, simulation_params):
+            yield self.simulate_from_samples(samples)
+
+    def price_steps_from_samples(self, samples):
+        # Generator of the price vector today and at each observed step, for payoffs that accumulate along the path.
+        # Simulators that step through time override this so the path matrix is never built
+        for prices in self.simulate_from_samples(samples).T:
+            yield prices
+
+    def sensitivity_steps_from_samples(self, samples):
+        # Generator of (prices, d prices / d initial price, d prices / d volatility) today and at each observed step, for pathwise Greeks
+        raise NotImplementedError(f"{type(self).__name__} does not provide pathwise sensitivities")
+
+    def brownian_increments(self, samples):
+        # Standard normal draws of the Brownian motion driving the price and the time step of each, for control variates
+        # built from the same randomness as the paths
+        raise NotImplementedError(f"{type(self).__name__} does not expose its Brownian increments")
+
+    def coarse_samples(self, samples):
+        # Draws of the same Brownian path on a grid with half the 'time_steps': consecutive pairs of increments are summed
+        # and rescaled to unit variance. The draws of a step are assumed consecutive, on the uniform time step grid
+        steps = self.simulation_params['time_steps']
+        draws_per_step, remainder = divmod(samples.shape[1], steps)
+        if remainder or draws_per_step == 0 or steps % 2:
+            raise ValueError("Coarsening needs an even number of steps on the uniform time step grid")
+        if not isinstance(self.sample_distribution(), NormalDistribution):
+            raise ValueError("Coarsening requires normally distributed draws")
+
+        distribution = self.sample_distribution()
+        pairs = (samples.reshape(samples.shape[0], steps // 2, 2, draws_per_step) - distribution.mean) / distribution.std
+        coarse = (pairs[:, :, 0] + pairs[:, :, 1]) / np.sqrt(2)
+        return (coarse * distribution.std + distribution.mean).reshape(samples.shape[0], -1).astype(samples.dtype, copy=False)
+
+    def standard_normals(self, samples):
+        # Draws from another sample distribution are mapped to the normals with the same quantiles
+        distribution = self.sample_distribution()
+        if isinstance(distribution, NormalDistribution):
+            return (samples - distribution.mean) / distribution.std
+        return norm.ppf(distribution.cdf(samples))
+
+    def reference_volatility(self):
+        # Constant volatility of the closest Black-Scholes model, for control variates
+        raise NotImplementedError(f"{type(self).__name__} has no reference volatility")
+
+    def initial_price_score(self, samples):
+        # Likelihood ratio score d log density / d initial price of each path, for likelihood ratio Greeks
+        raise NotImplementedError(f"{type(self).__name__} does not provide likelihood ratio scores")
+
+    def simulate_step_chunks(self, chunk_size: int = None, simulation_params: dict = None):
+        # Generator of one price step generator per sample block
+        for samples in self.sample_chunks(chunk_size, simulation_params):
+            yield self.price_steps_from_samples(samples)
+
+    def simulate_backward(self, simulation_params: dict = None):
+        # Generator of (step, prices) pairs from maturity back to today, keeping only O(paths) state
+        raise NotImplementedError(f"{type(self).__name__} does not support backward simulation")
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+from models.exotic.asian import AsianOptionSimulationModel, AnalyticalGeometricAsianOptionPricingModel
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.3,
+        'time_steps': 12,
+        'simulation_paths': 20000,
+        'seed': 7,
+    }
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'strike_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'option_type': 'call',
+        'asian_type': 'price',
+        'average_type': 'arithmetic',
+    }
+
+
+def test_streamed_price_matches_path_matrix(simulation_params, option_params):
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    simulated_prices = GeometricBrownianMotion(simulation_params).simulate()
+
+    for average_type in ('arithmetic', 'geometric'):
+        params = {**option_params, 'average_type': average_type}
+        assert pricer.price(params) == pytest.approx(pricer.price(params, simulated_prices=simulated_prices), rel=1e-12)
+
+
+def test_geometric_closed_form_matches_simulation(simulation_params, option_params):
+    params = {**option_params, 'average_type': 'geometric', 'option_type': 'put', 'fixing_times': np.arange(1, 13) / 12}
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error = pricer.price_and_standard_error(params, chunk_size=5000)
+
+    analytical_price = AnalyticalGeometricAsianOptionPricingModel().price({**simulation_params, **params})
+    assert np.abs(price - analytical_price) < 4 * standard_error
+
+
+def test_control_variate_reduces_standard_error(simulation_params, option_params):
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error = pricer.price_and_standard_error(option_params)
+    cv_price, cv_standard_error = pricer.arithmetic_price_geometric_control_variate_and_standard_error(option_params, chunk_size=5000)
+
+    assert cv_standard_error < standard_error / 10
+    assert np.abs(cv_price - price) < 4 * standard_error
+
+
+def test_greeks_match_geometric_closed_form(simulation_params, option_params):
+    params = {**option_params, 'average_type': 'geometric', 'fixing_times': np.arange(1, 13) / 12}
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, greeks, standard_errors = pricer.price_and_greeks(params, chunk_size=5000)
+
+    # Central differences of the closed form
+    def analytical_price(S0=100, sigma=0.3):
+        return AnalyticalGeometricAsianOptionPricingModel().price({**simulation_params, **params, 'initial_stock_price': S0, 'volatility': sigma})
+    expected = {
+        'delta': (analytical_price(S0=100.01) - analytical_price(S0=99.99)) / 0.02,
+        'gamma': (analytical_price(S0=100.01) - 2 * analytical_price() + analytical_price(S0=99.99)) / 0.01**2,
+        'vega': (analytical_price(sigma=0.3001) - analytical_price(sigma=0.2999)) / 0.0002,
+    }
+
+    assert np.abs(price - analytical_price()) < 4 * standard_errors['price']
+    for greek, value in expected.items():
+        assert np.abs(greeks[greek] - value) < 4 * standard_errors[greek]
+
+
+def test_gamma_with_today_in_the_average(simulation_params, option_params):
+    # Without fixing dates today's price is a fixing, so the payoff depends on S0 directly as well as through the paths
+    simulation_params = {**simulation_params, 'time_steps': 4}
+
+    def price(average_type, S0):
+        params = {**option_params, 'average_type': average_type}
+        return AsianOptionSimulationModel(GeometricBrownianMotion({**simulation_params, 'initial_stock_price': S0})).price(params)
+
+    def analytical_price(S0):
+        params = {**option_params, 'average_type': 'geometric', 'fixing_times': np.arange(5) / 4}
+        return AnalyticalGeometricAsianOptionPricingModel().price({**simulation_params, **params, 'initial_stock_price': S0})
+
+    expected = {
+        'arithmetic': (price('arithmetic', 102) - 2 * price('arithmetic', 100) + price('arithmetic', 98)) / 2**2,
+        'geometric': (analytical_price(100.01) - 2 * analytical_price(100) + analytical_price(99.99)) / 0.01**2,
+    }
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    for average_type, gamma in expected.items():
+        _, greeks, standard_errors = pricer.price_and_greeks({**option_params, 'average_type': average_type})
+        assert np.abs(greeks['gamma'] - gamma) < 4 * standard_errors['gamma']
+
+    with pytest.raises(ValueError):
+        pricer.price_and_greeks({**option_params, 'asian_type': 'strike'})
+
+
+def test_path_constructions_reduce_the_randomized_qmc_error(simulation_params, option_params):
+    params = {**simulation_params, 'time_steps': 64, 'simulation_paths': 1024}
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(params))
+
+    spreads = {}
+    for construction in ('incremental', 'brownian_bridge', 'pca'):
+        prices = [pricer.price(option_params, {**params, 'seed': seed, 'path_construction': construction}) for seed in range(8)]
+        spreads[construction] = np.std(prices, ddof=1)
+
+    assert spreads['brownian_bridge'] < spreads['incremental'] / 2
+    assert spreads['pca'] < spreads['incremental'] / 2
+
+
+def test_importance_sampling_prices_deep_out_of_the_money_geometric_puts(simulation_params, option_params):
+    params = {**option_params, 'average_type': 'geometric', 'option_type': 'put', 'strike_price': 50, 'fixing_times': np.arange(1, 13) / 12}
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error = pricer.price_and_standard_error(params, {**simulation_params, 'importance_sampling': True})
+
+    analytical_price = AnalyticalGeometricAsianOptionPricingModel().price({**simulation_params, **params})
+    assert np.abs(price - analytical_price) < 4 * standard_error
+    assert standard_error < analytical_price / 50
+
+
+def test_floating_strike_with_early_fixings_pays_against_the_terminal_price(simulation_params, option_params):
+    # The last fixing is before maturity, so the terminal price is observed without joining the average
+    params = {**option_params, 'asian_type': 'strike', 'fixing_times': [0.25, 0.5]}
+    pricer = AsianOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price = pricer.price(params)
+
+    simulated_prices = GeometricBrownianMotion({**simulation_params, 'observation_times': [0.25, 0.5, 1]}).simulate()
+    payoffs = np.maximum(simulated_prices[:, -1] - simulated_prices[:, 1:3].mean(axis=1), 0)
+    expected = np.exp(-option_params['risk_free_rate']) * payoffs.mean()
+    assert price == pytest.approx(expected, rel=1e-12)
+    assert pricer.price_and_greeks(params)[0] == pytest.approx(expected, rel=1e-12)
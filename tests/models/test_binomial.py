@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from models.american.binomial import BinomialModel
+from models.european.black_scholes import BlackScholesModel
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'initial_stock_price': 200,
+        'strike_price': 210,
+        'time_to_maturity': 3,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'dividend_yield': 0.01,
+        'option_type': 'put',
+        'is_american': False,
+        'time_steps': 2000,
+    }
+
+
+def test_european_price_converges_to_black_scholes(option_params):
+    binomial_price = BinomialModel().price(option_params)
+    bs_price = BlackScholesModel().price(option_params)
+
+    assert np.abs(binomial_price - bs_price) < 1e-2
+
+
+def test_american_put_boundary_is_recorded(option_params):
+    params = {**option_params, 'is_american': True, 'time_steps': 500}
+    price, boundary = BinomialModel().price_and_boundary(params)
+
+    assert np.isclose(price, BinomialModel().price(params))
+    assert price > BlackScholesModel().price(params)
+
+    # The put exercise boundary lies below the strike and rises towards it at expiry
+    exercised = ~np.isnan(boundary[:, 1])
+    assert exercised.sum() > 0
+    assert np.all(boundary[exercised, 1] < params['strike_price'])
+    assert boundary[exercised, 1][-1] > boundary[exercised, 1][0]
+
+
+def test_large_trees_fit_in_memory(option_params):
+    params = {**option_params, 'is_american': True, 'time_steps': 20000}
+    price = BinomialModel().price(params)
+
+    assert np.abs(price - BinomialModel().price({**params, 'time_steps': 10000})) < 1e-3
+
+
+def test_price_batch_matches_individual_trees(option_params):
+    model = BinomialModel()
+    strikes = np.array([180, 200, 220, 180, 200, 220])
+    maturities = np.array([1, 1, 1, 2, 2, 2])
+    is_call = np.array([False, True, False, True, False, True])
+    is_american = np.array([True, True, False, True, True, False])
+
+    batch_prices = model.price_batch(200, strikes, maturities, 0.05, 0.2, 0.01, is_call, is_american, time_steps=300)
+
+    for i in range(len(strikes)):
+        price = model.price({
+            **option_params,
+            'strike_price': strikes[i],
+            'time_to_maturity': maturities[i],
+            'option_type': 'call' if is_call[i] else 'put',
+            'is_american': is_american[i],
+            'time_steps': 300,
+        })
+        assert np.isclose(batch_prices[i], price, rtol=1e-12)
+
+
+def test_leisen_reimer_european_price_is_accurate_with_few_steps(option_params):
+    price = BinomialModel(lattice='leisen_reimer').price({**option_params, 'time_steps': 100})
+
+    assert np.abs(price - BlackScholesModel().price(option_params)) < 1e-3
+
+
+@pytest.mark.parametrize('lattice, smoothing', [('ud_binomial', 'black_scholes'), ('leisen_reimer', None)])
+def test_extrapolated_trees_are_accurate_with_few_steps(option_params, lattice, smoothing):
+    model = BinomialModel(lattice=lattice, smoothing=smoothing, richardson=True)
+    plain_model = BinomialModel(lattice=lattice, smoothing=smoothing)
+
+    european_error = np.abs(model.price({**option_params, 'time_steps': 100}) - BlackScholesModel().price(option_params))
+    assert european_error < 2e-3
+    assert european_error <= np.abs(plain_model.price({**option_params, 'time_steps': 100}) - BlackScholesModel().price(option_params))
+
+    american_params = {**option_params, 'is_american': True}
+    reference = BinomialModel(smoothing='black_scholes', richardson=True).price({**american_params, 'time_steps': 4000})
+    american_error = np.abs(model.price({**american_params, 'time_steps': 100}) - reference)
+    assert american_error < 1e-2
+    assert american_error <= np.abs(plain_model.price({**american_params, 'time_steps': 100}) - reference)
+
+
+def test_smoothed_leisen_reimer_extrapolation_converges(option_params):
+    # Smoothing makes the Leisen-Reimer error O(1/n), which the extrapolation must remove rather than overshoot
+    model = BinomialModel(lattice='leisen_reimer', smoothing='black_scholes', richardson=True)
+    plain_model = BinomialModel(lattice='leisen_reimer', smoothing='black_scholes')
+    bs_price = BlackScholesModel().price(option_params)
+
+    for steps in (251, 501):
+        error = np.abs(model.price({**option_params, 'time_steps': steps}) - bs_price)
+        assert error < 2e-4
+        assert error < np.abs(plain_model.price({**option_params, 'time_steps': steps}) - bs_price) / 50
+
+
+def test_richardson_extrapolation_needs_two_time_steps(option_params):
+    with pytest.raises(ValueError):
+        BinomialModel(richardson=True).price({**option_params, 'time_steps': 1})
+
+
+@pytest.mark.parametrize('extended_tree', [False, True])
+@pytest.mark.parametrize('lattice', ['ud_binomial', 'leisen_reimer'])
+def test_tree_greeks_match_black_scholes(option_params, extended_tree, lattice):
+    # The extended tree shares the plain tree's lattice, so it prices exactly as the plain one
+    model = BinomialModel(lattice=lattice)
+    price, greeks = model.price_and_greeks({**option_params, 'time_steps': 1000}, extended_tree)
+    expected = BlackScholesModel().greeks_batch(200, 210, 3, 0.05, 0.2, 0.01, False)
+
+    assert price == pytest.approx(model.price({**option_params, 'time_steps': 1000}), rel=1e-12)
+    assert price == pytest.approx(expected['price'], abs=1e-2)
+    assert greeks['delta'] == pytest.approx(expected['delta'], abs=1e-3)
+    assert greeks['gamma'] == pytest.approx(expected['gamma'], rel=1e-2)
+    assert greeks['theta'] == pytest.approx(expected['theta'], rel=1e-2)
+
+
+def test_greeks_batch_matches_single_contracts(option_params):
+    strikes = np.array([190.0, 210.0, 230.0])
+    greeks = BinomialModel().greeks_batch(200, strikes, 3, 0.05, 0.2, 0.01, False, True, 300, extended_tree=True)
+
+    for i, strike in enumerate(strikes):
+        price, single_greeks = BinomialModel().price_and_greeks(
+            {**option_params, 'strike_price': strike, 'is_american': True, 'time_steps': 300}, extended_tree=True)
+        assert greeks['price'][i] == pytest.approx(price, rel=1e-12)
+        for name, value in single_greeks.items():
+            assert greeks[name][i] == pytest.approx(value, rel=1e-10)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from models.european.black_scholes import BlackScholesModel
+
+
+@pytest.fixture
+def chain():
+    rng = np.random.default_rng(0)
+    n = 200
+    return {
+        'S0': rng.uniform(50, 150, n),
+        'K': rng.uniform(50, 150, n),
+        'T': rng.uniform(0.05, 3, n),
+        'r': rng.uniform(0, 0.08, n),
+        'sigma': rng.uniform(0.05, 0.8, n),
+        'delta': rng.uniform(0, 0.04, n),
+        'is_call': rng.uniform(size=n) < 0.5,
+    }
+
+
+def test_price_batch_matches_scalar_price(chain):
+    model = BlackScholesModel()
+    batch_prices = model.price_batch(**chain)
+
+    for i in range(len(batch_prices)):
+        scalar_price = model.price({
+            'initial_stock_price': chain['S0'][i],
+            'strike_price': chain['K'][i],
+            'time_to_maturity': chain['T'][i],
+            'risk_free_rate': chain['r'][i],
+            'volatility': chain['sigma'][i],
+            'dividend_yield': chain['delta'][i],
+            'option_type': 'call' if chain['is_call'][i] else 'put',
+        })
+        assert np.isclose(batch_prices[i], scalar_price, rtol=1e-12, atol=1e-12)
+
+
+def test_greeks_batch_matches_finite_differences(chain):
+    model = BlackScholesModel()
+    greeks = model.greeks_batch(**chain)
+    h = 1e-4
+
+    def bumped(name, bump):
+        return model.price_batch(**{**chain, name: chain[name] + bump})
+
+    delta = (bumped('S0', h) - bumped('S0', -h)) / (2 * h)
+    gamma = (bumped('S0', h) - 2 * greeks['price'] + bumped('S0', -h)) / h**2
+    vega = (bumped('sigma', h) - bumped('sigma', -h)) / (2 * h)
+    theta = -(bumped('T', h) - bumped('T', -h)) / (2 * h)
+    rho = (bumped('r', h) - bumped('r', -h)) / (2 * h)
+
+    assert np.allclose(greeks['delta'], delta, atol=1e-6)
+    assert np.allclose(greeks['gamma'], gamma, atol=1e-3)
+    assert np.allclose(greeks['vega'], vega, atol=1e-5)
+    assert np.allclose(greeks['theta'], theta, atol=1e-5)
+    assert np.allclose(greeks['rho'], rho, atol=1e-5)
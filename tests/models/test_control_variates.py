@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from models.control_variates import BlackScholesControlVariate
+from models.european.black_scholes import BlackScholesModel
+from models.european.european_option_simulation import EuropeanOptionSimulationModel
+from models.european.heston import HestonModel
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'strike_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.03,
+        'option_type': 'call',
+    }
+
+
+def test_black_scholes_control_is_exact_under_black_scholes(option_params):
+    simulation_params = {'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.03, 'volatility': 0.2,
+                         'dividend_yield': 0.01, 'simulation_paths': 4096, 'seed': 3}
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params), [BlackScholesControlVariate()])
+    price, standard_error = pricer.price_and_standard_error(option_params, chunk_size=1024)
+
+    # The control is the payoff itself, so nothing is left of the noise
+    assert price == pytest.approx(BlackScholesModel().price({**simulation_params, **option_params}), abs=1e-10)
+    assert standard_error < 1e-8
+
+
+def test_black_scholes_control_reduces_heston_standard_error(option_params):
+    simulation_params = {'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.03, 'initial_variance': 0.04,
+                         'kappa': 1.5, 'theta': 0.05, 'volvol': 0.3, 'rho': -0.7, 'time_steps': 50, 'simulation_paths': 20000,
+                         'seed': 5, 'discretization': 'quadratic_exponential', 'antithetic': True}
+    price, standard_error = EuropeanOptionSimulationModel(HestonProcess(simulation_params)).price_and_standard_error(option_params)
+    cv_price, cv_standard_error = EuropeanOptionSimulationModel(HestonProcess(simulation_params), [BlackScholesControlVariate()]).price_and_standard_error(option_params)
+
+    assert cv_standard_error < standard_error / 2
+    assert np.abs(cv_price - HestonModel().price({**simulation_params, **option_params})) < 4 * cv_standard_error
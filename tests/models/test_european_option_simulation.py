@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from models.european.black_scholes import BlackScholesModel
+from models.european.european_option_simulation import EuropeanOptionSimulationModel
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+from distributions.t_distribution import TDistribution
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'dividend_yield': 0.01,
+        'time_steps': 50,
+        'simulation_paths': 50000,
+    }
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'initial_stock_price': 100,
+        'strike_price': 105,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'dividend_yield': 0.01,
+        'option_type': 'call',
+    }
+
+
+def test_chunked_price_matches_black_scholes(simulation_params, option_params):
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error = pricer.price_and_standard_error(option_params, simulation_params, chunk_size=4096)
+
+    assert standard_error > 0
+    assert np.abs(price - BlackScholesModel().price(option_params)) < 4 * standard_error
+
+
+def test_single_precision_simulation_is_close_to_double_precision(simulation_params, option_params):
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    params = {**simulation_params, 'seed': 9}
+
+    single_precision_paths = pricer.simulator.simulate({**params, 'dtype': np.float32})
+    single_precision_price = pricer.price(option_params, {**params, 'dtype': np.float32})
+    double_precision_price = pricer.price(option_params, params)
+
+    assert single_precision_paths.dtype == np.float32
+    assert np.abs(single_precision_price - double_precision_price) < 1e-4
+
+
+@pytest.mark.parametrize('option_type', ['call', 'put'])
+def test_greeks_match_black_scholes(simulation_params, option_params, option_type):
+    params = {**option_params, 'option_type': option_type}
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, greeks, standard_errors = pricer.price_and_greeks(params, {**simulation_params, 'seed': 5}, chunk_size=8192)
+
+    expected = BlackScholesModel().greeks_batch(100, 105, 1, 0.05, 0.2, 0.01, option_type == 'call')
+    assert np.abs(price - expected['price']) < 4 * standard_errors['price']
+    for greek in ('delta', 'gamma', 'vega'):
+        assert standard_errors[greek] > 0
+        assert np.abs(greeks[greek] - expected[greek]) < 4 * standard_errors[greek]
+
+
+@pytest.mark.parametrize('tolerance', [{'absolute_tolerance': 2e-3}, {'relative_tolerance': 1e-3}])
+def test_price_to_tolerance_meets_the_target(simulation_params, option_params, tolerance):
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error, paths, wall_time = pricer.price_to_tolerance(option_params, **tolerance, simulation_params={**simulation_params, 'seed': 3})
+
+    target = tolerance.get('absolute_tolerance', tolerance.get('relative_tolerance', 0) * price)
+    assert 0 < standard_error <= target
+    assert paths % 8 == 0 and paths < 2**22
+    assert wall_time > 0
+    assert np.abs(price - BlackScholesModel().price(option_params)) < 4 * standard_error
+
+
+def test_price_to_tolerance_needs_a_tolerance(simulation_params, option_params):
+    with pytest.raises(ValueError):
+        EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params)).price_to_tolerance(option_params)
+
+
+def test_importance_sampling_prices_deep_out_of_the_money_calls(simulation_params, option_params):
+    params = {**option_params, 'strike_price': 200}
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    plain_price, plain_standard_error = pricer.price_and_standard_error(params, {**simulation_params, 'seed': 2})
+    price, standard_error = pricer.price_and_standard_error(params, {**simulation_params, 'seed': 2, 'importance_sampling': True})
+
+    expected = BlackScholesModel().price(params)
+    assert np.abs(price - expected) < 4 * standard_error
+    assert standard_error < expected / 100
+    assert standard_error < plain_standard_error / 20
+
+
+def test_drift_shift_search_restores_the_simulator_params(simulation_params, option_params, monkeypatch):
+    simulator = GeometricBrownianMotion({**simulation_params, 'dtype': np.float32})
+    pricer = EuropeanOptionSimulationModel(simulator)
+    original_params = simulator.simulation_params
+
+    def failing_payoffs(params, simulated_prices):
+        raise RuntimeError("payoff failed")
+    monkeypatch.setattr(pricer, 'discounted_payoffs', failing_payoffs)
+    with pytest.raises(RuntimeError):
+        pricer.optimal_drift_shift(option_params, simulation_params)
+    assert simulator.simulation_params is original_params
+
+    monkeypatch.undo()
+    pricer.optimal_drift_shift({**option_params, 'strike_price': 200}, simulation_params)
+    assert simulator.simulation_params is original_params
+
+
+def test_likelihood_ratio_gamma_uses_the_sample_density(simulation_params, option_params):
+    params = {**option_params, 'strike_price': 90, 'option_type': 'put'}
+    simulation_params = {**simulation_params, 'seed': 5, 'distribution_model': TDistribution(3)}
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    price, greeks, standard_errors = pricer.price_and_greeks(params, simulation_params, chunk_size=8192)
+
+    # Central difference of the same pricer on common random numbers
+    prices = [pricer.price(params, {**simulation_params, 'initial_stock_price': 100 + shift}) for shift in (-2, 0, 2)]
+    finite_difference_gamma = (prices[0] - 2 * prices[1] + prices[2]) / 4
+    assert np.abs(greeks['gamma'] - finite_difference_gamma) < 4 * standard_errors['gamma']
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from models.european.heston import HestonModel
+from models.european.european_option_simulation import EuropeanOptionSimulationModel
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def params():
+    return {
+        'initial_stock_price': 100,
+        'strike_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.0,
+        'initial_variance': 0.0175,
+        'kappa': 1.5768,
+        'theta': 0.0398,
+        'volvol': 0.5751,
+        'rho': -0.5711,
+        'option_type': 'call',
+    }
+
+
+def test_matches_reference_prices(params):
+    # Reference values from Fang and Oosterlee (2008) and Andersen (2008)
+    assert HestonModel().price(params) == pytest.approx(5.785155450, abs=1e-5)
+
+    andersen_params = {**params, 'time_to_maturity': 10, 'initial_variance': 0.04, 'kappa': 0.5, 'theta': 0.04, 'volvol': 1.0, 'rho': -0.9}
+    assert HestonModel().price(andersen_params) == pytest.approx(13.0847, abs=1e-4)
+
+
+def test_strike_vector_matches_single_strikes_and_parity(params):
+    params = {**params, 'risk_free_rate': 0.03, 'dividend_yield': 0.01}
+    strikes = np.array([70.0, 90.0, 100.0, 110.0, 140.0])
+    model = HestonModel()
+
+    calls = model.price({**params, 'strike_price': strikes})
+    puts = model.price_strikes(params, strikes, is_call=False)
+    single_calls = [model.price({**params, 'strike_price': K}) for K in strikes]
+
+    assert calls == pytest.approx(single_calls, abs=1e-6)
+    assert calls - puts == pytest.approx(100 * np.exp(-0.01) - strikes * np.exp(-0.03), abs=1e-10)
+
+
+def test_agrees_with_simulation(params):
+    simulation_params = {**params, 'time_steps': 16, 'simulation_paths': 2**16, 'seed': 11, 'discretization': 'quadratic_exponential'}
+    pricer = EuropeanOptionSimulationModel(HestonProcess(simulation_params))
+    price, standard_error = pricer.price_and_standard_error(params)
+
+    assert np.abs(price - HestonModel().price(params)) < 4 * standard_error
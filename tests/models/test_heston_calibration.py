@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from models.european.heston import HestonModel
+from models.european.heston_calibration import HestonCalibrator
+
+
+@pytest.fixture
+def heston_params():
+    return {'initial_variance': 0.03, 'kappa': 1.8, 'theta': 0.06, 'volvol': 0.7, 'rho': -0.65}
+
+
+@pytest.fixture
+def option_chain(heston_params):
+    S0, r, q = 100.0, 0.03, 0.01
+    maturities = np.array([0.1, 0.25, 0.5, 1.0, 2.0])
+    strikes = np.linspace(75, 125, 21)
+
+    T = np.repeat(maturities, strikes.shape[0])
+    K = np.tile(strikes, maturities.shape[0])
+    is_call = K >= S0
+    prices = np.concatenate([HestonModel().price_strikes({'initial_stock_price': S0, 'time_to_maturity': maturity, 'risk_free_rate': r,
+                                                          'dividend_yield': q, **heston_params}, strikes, strikes >= S0)
+                             for maturity in maturities])
+    return S0, K, T, r, q, is_call, prices
+
+
+def test_characteristic_function_gradient_matches_finite_differences(heston_params):
+    model = HestonModel()
+    u = np.linspace(0, 30, 7)
+    x = np.array([heston_params[name] for name in HestonCalibrator.parameter_names])
+    phi, gradient = model.characteristic_function_gradient(u, 1.3, 0.02, 0.01, *x)
+
+    for i in range(x.shape[0]):
+        step = np.zeros_like(x)
+        step[i] = 1e-6
+        finite_difference = (model.characteristic_function(u, 1.3, 0.02, 0.01, *(x + step)) - model.characteristic_function(u, 1.3, 0.02, 0.01, *(x - step))) / 2e-6
+        assert np.allclose(gradient[i], finite_difference, atol=1e-7)
+
+
+@pytest.mark.parametrize('objective', ['implied_volatility', 'price'])
+def test_recovers_parameters_from_model_prices(option_chain, heston_params, objective):
+    S0, K, T, r, q, is_call, prices = option_chain
+    start = {'initial_variance': 0.08, 'kappa': 5.0, 'theta': 0.02, 'volvol': 1.5, 'rho': 0.0}
+    fitted = HestonCalibrator(objective=objective, workers=2).fit(S0, K, T, r, prices, q, is_call, start)
+
+    for name, value in heston_params.items():
+        assert fitted[name] == pytest.approx(value, rel=1e-4)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from models.american.binomial import BinomialModel
+from models.american.least_squares_monte_carlo import LeastSquaresMonteCarloModel
+from models.american.regression import PolynomialBasis, LaguerreBasis, HermiteBasis, PayoffAugmentedBasis
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'dividend_yield': 0.0,
+        'time_steps': 50,
+        'simulation_paths': 20000,
+        'seed': 42,
+    }
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'initial_stock_price': 100,
+        'strike_price': 110,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'dividend_yield': 0.0,
+        'option_type': 'put',
+        'is_american': True,
+    }
+
+
+@pytest.mark.parametrize('basis', [
+    PolynomialBasis(2),
+    LaguerreBasis(3),
+    HermiteBasis(3),
+    PayoffAugmentedBasis(PolynomialBasis(2)),
+])
+def test_lsmc_is_close_to_binomial_price(simulation_params, option_params, basis):
+    tree_price = BinomialModel(smoothing='black_scholes', richardson=True).price(option_params)
+    pricer = LeastSquaresMonteCarloModel(GeometricBrownianMotion(simulation_params), basis)
+
+    assert np.abs(pricer.price(option_params, simulation_params) - tree_price) < 0.15
+
+
+def test_backward_simulation_is_close_to_forward_simulation(simulation_params, option_params):
+    simulator = GeometricBrownianMotion(simulation_params)
+    forward_price, forward_boundary = LeastSquaresMonteCarloModel(simulator).price_and_boundary(option_params, simulation_params)
+    backward_price, backward_boundary = LeastSquaresMonteCarloModel(simulator, backward_simulation=True).price_and_boundary(option_params, simulation_params)
+
+    assert np.abs(forward_price - backward_price) < 0.15
+    assert forward_boundary.shape == backward_boundary.shape
+    assert np.nanmax(backward_boundary[:, 1]) < option_params['strike_price']
+
+
+def test_backward_simulation_is_rejected_for_simulators_without_it(simulation_params):
+    with pytest.raises(ValueError, match="HestonProcess does not support backward simulation"):
+        LeastSquaresMonteCarloModel(HestonProcess(simulation_params), backward_simulation=True)
+
+
+def test_price_to_tolerance_is_close_to_binomial_price(simulation_params, option_params):
+    tree_price = BinomialModel(smoothing='black_scholes', richardson=True).price(option_params)
+    pricer = LeastSquaresMonteCarloModel(GeometricBrownianMotion(simulation_params))
+    price, standard_error, paths, wall_time = pricer.price_to_tolerance(option_params, absolute_tolerance=0.03)
+
+    assert standard_error <= 0.03
+    # Least squares Monte Carlo is biased low by its in-sample exercise policy
+    assert np.abs(price - tree_price) < 0.15
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from models.european.black_scholes import BlackScholesModel
+from models.european.european_option_simulation import EuropeanOptionSimulationModel
+from models.multilevel_monte_carlo import MultilevelMonteCarloEngine
+from simulations.drift_diffusion_kernels import AffineKernel
+from simulations.generic_drift_diffusion_process import GenericDriftDiffusionProcess
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'strike_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'option_type': 'call',
+    }
+
+
+def test_coarse_samples_drive_the_same_brownian_path():
+    simulation_params = {'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05, 'initial_variance': 0.04,
+                         'kappa': 1.5, 'theta': 0.05, 'volvol': 0.3, 'rho': -0.7, 'time_steps': 8}
+    simulator = HestonProcess(simulation_params)
+    samples = simulator.quasi_random_samples(4096, seed=2)
+    coarse = simulator.coarse_samples(samples)
+
+    # Both Brownian motions of the coarse grid end where the fine ones do
+    fine_increments = samples.reshape(-1, 8, 2) * np.sqrt(1 / 8)
+    coarse_increments = coarse.reshape(-1, 4, 2) * np.sqrt(1 / 4)
+    np.testing.assert_allclose(coarse_increments.sum(axis=1), fine_increments.sum(axis=1), atol=1e-12)
+    np.testing.assert_allclose(coarse.std(axis=0), 1, atol=0.05)
+
+
+def test_euler_gbm_price_meets_the_target_error(option_params):
+    simulation_params = {'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05}
+    pricer = EuropeanOptionSimulationModel(GenericDriftDiffusionProcess(simulation_params, kernel=AffineKernel(drift_slope=0.05, diffusion_slope=0.2)))
+    price, standard_error, levels = MultilevelMonteCarloEngine(seed=1).price_to_rmse(pricer, option_params, 0.05, simulation_params)
+
+    assert standard_error <= 0.05 / np.sqrt(2) * 1.01
+    assert np.abs(price - BlackScholesModel().price({**simulation_params, **option_params, 'volatility': 0.2})) < 0.15
+
+    # Corrections shrink with the level and so do the paths spent on them
+    assert len(levels) >= 3
+    assert all(finer['variance'] < coarser['variance'] for coarser, finer in zip(levels[1:], levels[2:]))
+    assert all(finer['paths'] < coarser['paths'] for coarser, finer in zip(levels, levels[1:]))
+
+
+def test_loose_target_stops_at_the_minimum_levels(option_params):
+    # The corrections are far below a loose target, so the coarsest price must not count towards the bias
+    simulation_params = {'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05}
+    pricer = EuropeanOptionSimulationModel(GenericDriftDiffusionProcess(simulation_params, kernel=AffineKernel(drift_slope=0.05, diffusion_slope=0.2)))
+    engine = MultilevelMonteCarloEngine(seed=1)
+    _, _, levels = engine.price_to_rmse(pricer, option_params, 0.5, simulation_params)
+
+    assert len(levels) == engine.min_levels + 1
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from models.european.european_option_simulation import EuropeanOptionSimulationModel
+from models.parallel_monte_carlo import ParallelMonteCarloEngine
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'time_steps': 20,
+        'simulation_paths': 30000,
+    }
+
+
+@pytest.fixture
+def option_params():
+    return {
+        'strike_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'option_type': 'call',
+    }
+
+
+@pytest.mark.parametrize('stream_splitting', ['sobol_blocks', 'independent'])
+def test_same_seed_and_workers_give_identical_prices(simulation_params, option_params, stream_splitting):
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+    engine = ParallelMonteCarloEngine(workers=3, seed=11, stream_splitting=stream_splitting)
+
+    first = engine.price_and_standard_error(pricer, option_params, simulation_params, chunk_size=4096)
+    second = engine.price_and_standard_error(pricer, option_params, simulation_params, chunk_size=4096)
+
+    assert first == second
+
+
+def test_sobol_blocks_reproduce_the_serial_sequence(simulation_params, option_params):
+    pricer = EuropeanOptionSimulationModel(GeometricBrownianMotion(simulation_params))
+
+    serial = ParallelMonteCarloEngine(workers=1, seed=5).payoff_statistics(pricer, option_params, simulation_params)
+    sharded = ParallelMonteCarloEngine(workers=4, seed=5).payoff_statistics(pricer, option_params, simulation_params)
+
+    assert sharded.count == serial.count
+    assert np.isclose(sharded.mean, serial.mean, rtol=1e-12)
+    assert np.isclose(sharded.variance, serial.variance, rtol=1e-10)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from numpy.polynomial import laguerre, hermite_e
+from models.american.regression import PolynomialBasis, LaguerreBasis, HermiteBasis, PayoffAugmentedBasis, least_squares
+
+
+@pytest.fixture
+def in_the_money_put():
+    # Strike-normalized prices of in-the-money put paths and their exercise values
+    x = np.random.default_rng(3).uniform(0.6, 1.0, 500)
+    return x, 1 - x
+
+
+def test_bases_match_numpy_polynomials(in_the_money_put):
+    x, _ = in_the_money_put
+    out = np.empty((x.shape[0], 4))
+
+    np.testing.assert_allclose(PolynomialBasis(3).evaluate(x, out), np.vander(x, 4, increasing=True))
+    np.testing.assert_allclose(HermiteBasis(3).evaluate(x, out), hermite_e.hermevander(x - 1, 3))
+
+    expected = np.column_stack([np.ones_like(x), np.exp(-x / 2)[:, None] * laguerre.lagvander(x, 2)])
+    np.testing.assert_allclose(LaguerreBasis(3).evaluate(x, out), expected)
+
+
+@pytest.mark.parametrize('basis', [PolynomialBasis(2), LaguerreBasis(3), HermiteBasis(3)])
+def test_payoff_augmented_design_has_full_rank(in_the_money_put, basis):
+    x, payoff = in_the_money_put
+    augmented = PayoffAugmentedBasis(basis)
+    X = augmented.evaluate(x, np.empty((x.shape[0], augmented.size())), payoff)
+
+    assert np.linalg.matrix_rank(X) == augmented.size()
+    with pytest.raises(ValueError):
+        augmented.evaluate(x, np.empty((x.shape[0], augmented.size())))
+
+
+def test_least_squares_matches_lstsq(in_the_money_put):
+    x, payoff = in_the_money_put
+    Y = np.random.default_rng(4).standard_normal(x.shape[0])
+
+    X = PolynomialBasis(2).evaluate(x, np.empty((x.shape[0], 3)))
+    np.testing.assert_allclose(least_squares(X, Y), np.linalg.lstsq(X, Y, rcond=None)[0], rtol=1e-8)
+
+    # A column affine in the others makes the Gram matrix singular, which falls back to the minimum norm solution
+    X = np.column_stack([X, payoff])
+    coefficients = least_squares(X, Y)
+    np.testing.assert_allclose(X @ coefficients, X @ np.linalg.lstsq(X, Y, rcond=None)[0], atol=1e-10)
+    assert np.abs(coefficients).max() < 100
@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 from simulations.geometric_brownian_motion import GeometricBrownianMotion
 from simulations.generic_drift_diffusion_process import GenericDriftDiffusionProcess
+from simulations.drift_diffusion_kernels import AffineKernel, FunctionKernel
 
 # Define GBM drift and diffusion functions
 def gbm_drift(t, S, r=0.05, delta=0.0):
@@ -47,3 +48,31 @@ def test_generic_drift_diffusion_process(simulation_params):
 
     assert np.abs(simulated_mean - expected_mean) < 1.0, f"Mean difference too large: {np.abs(simulated_mean - expected_mean)}"
     assert np.abs(simulated_std - expected_std) < 1.0, f"Standard deviation difference too large: {np.abs(simulated_std - expected_std)}"
+
+def test_kernels_match_callables_and_milstein_reduces_strong_error(simulation_params):
+    simulation_params = {**simulation_params, 'time_steps': 50, 'simulation_paths': 4096, 'seed': 4}
+    callables = GenericDriftDiffusionProcess(simulation_params, gbm_drift, gbm_diffusion)
+    samples = callables.quasi_random_samples(4096)
+    expected = GeometricBrownianMotion(simulation_params).simulate_from_samples(samples)
+
+    homogeneous = FunctionKernel(lambda S: 0.05 * S, lambda S: 0.2 * S, lambda S: 0.2, time_homogeneous=True)
+    affine = AffineKernel(drift_slope=0.05, diffusion_slope=0.2)
+    euler = callables.simulate_from_samples(samples)
+    for kernel in (homogeneous, affine):
+        assert np.allclose(GenericDriftDiffusionProcess(simulation_params, kernel=kernel).simulate_from_samples(samples), euler)
+
+    milstein = GenericDriftDiffusionProcess({**simulation_params, 'discretization': 'milstein'}, kernel=homogeneous).simulate_from_samples(samples)
+    assert np.mean(np.abs(milstein[:, -1] - expected[:, -1])) < 0.2 * np.mean(np.abs(euler[:, -1] - expected[:, -1]))
+
+    with pytest.raises(ValueError):
+        GenericDriftDiffusionProcess({**simulation_params, 'discretization': 'milstein'}, gbm_drift, gbm_diffusion).simulate()
+
+
+def test_time_dependent_affine_coefficients_are_tabulated(simulation_params):
+    simulation_params = {**simulation_params, 'time_steps': 100, 'simulation_paths': 1024}
+    kernel = AffineKernel(drift_slope=lambda t: 0.05 + 0.1 * t, diffusion_slope=0.2)
+    callables = GenericDriftDiffusionProcess(simulation_params, lambda t, S: (0.05 + 0.1 * t) * S, gbm_diffusion)
+    samples = callables.quasi_random_samples(1024)
+
+    assert not kernel.time_homogeneous
+    assert np.allclose(GenericDriftDiffusionProcess(simulation_params, kernel=kernel).simulate_from_samples(samples), callables.simulate_from_samples(samples))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 5,
+        'risk_free_rate': 0.02,
+        'initial_variance': 0.04,
+        'kappa': 0.5,
+        'theta': 0.04,
+        'volvol': 1.0,
+        'rho': -0.9,
+        'time_steps': 10,
+        'simulation_paths': 2**15,
+        'seed': 5,
+        'discretization': 'quadratic_exponential',
+    }
+
+
+def test_quadratic_exponential_matches_variance_mean_and_martingale(simulation_params):
+    prices, variances = HestonProcess(simulation_params).simulate_prices_and_variances()
+    T = simulation_params['time_to_maturity']
+    kappa, theta, v0 = simulation_params['kappa'], simulation_params['theta'], simulation_params['initial_variance']
+
+    assert np.all(variances >= 0)
+    assert variances[:, -1].mean() == pytest.approx(theta + (v0 - theta) * np.exp(-kappa * T), rel=2e-2)
+    assert (np.exp(-simulation_params['risk_free_rate'] * T) * prices[:, -1]).mean() == pytest.approx(100, rel=2e-3)
+
+
+def test_quadratic_exponential_streams_the_observed_steps(simulation_params):
+    simulation_params = {**simulation_params, 'observation_times': [2.5, 5.0]}
+    simulator = HestonProcess(simulation_params)
+    samples = simulator.quasi_random_samples(256)
+    prices, variances = simulator.prices_and_variances_from_samples(samples)
+
+    assert prices.shape == (256, 3)
+    assert np.array_equal(np.column_stack(list(simulator.price_steps_from_samples(samples))), prices)
+
+
+def test_unknown_discretization_raises(simulation_params):
+    with pytest.raises(ValueError):
+        HestonProcess({**simulation_params, 'discretization': 'milstein'}).simulate()
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from distributions.normal_distribution import NormalDistribution
+from distributions.t_distribution import TDistribution
+from simulations.normal_variates import NormalVariateProvider
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+
+
+def test_exact_count_and_cache_hits():
+    provider = NormalVariateProvider()
+    samples = provider.samples(8, 1000, NormalDistribution(), seed=1)
+
+    assert samples.shape == (1000, 8)
+    assert provider.samples(8, 1000, NormalDistribution(), seed=1) is samples
+    assert not samples.flags.writeable
+
+    # A different distribution or seed is a different block
+    assert provider.samples(8, 1000, TDistribution(5), seed=1) is not samples
+    assert not np.array_equal(provider.samples(8, 1000, NormalDistribution(), seed=2), samples)
+
+
+def test_unseeded_draws_are_not_cached():
+    provider = NormalVariateProvider()
+    provider.samples(4, 100, NormalDistribution())
+
+    assert len(provider.cache) == 0
+
+
+def test_least_recently_used_blocks_are_evicted():
+    block_bytes = 100 * 4 * 8
+    provider = NormalVariateProvider(max_cache_bytes=2 * block_bytes)
+
+    first = provider.samples(4, 100, NormalDistribution(), seed=1)
+    provider.samples(4, 100, NormalDistribution(), seed=2)
+    provider.samples(4, 100, NormalDistribution(), seed=1)
+    provider.samples(4, 100, NormalDistribution(), seed=3)
+
+    assert provider.cache_bytes == 2 * block_bytes
+    assert provider.samples(4, 100, NormalDistribution(), seed=1) is first
+    assert (4, 100, 2, 0, provider.distribution_key(NormalDistribution()), 'float64') not in provider.cache
+
+
+def test_antithetic_and_moment_matched_samples():
+    simulator = GeometricBrownianMotion({'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05, 'volatility': 0.2,
+                                         'time_steps': 6, 'seed': 4, 'antithetic': True})
+    samples = simulator.quasi_random_samples(101)
+
+    # Path 2k + 1 mirrors path 2k, the last path is left unpaired
+    assert samples.shape == (101, 6)
+    np.testing.assert_allclose(samples[1::2], -samples[:-1:2])
+
+    simulator.simulation_params = {**simulator.simulation_params, 'antithetic': False, 'moment_matching': True}
+    samples = simulator.quasi_random_samples(100)
+    np.testing.assert_allclose(samples.mean(axis=0), 0, atol=1e-12)
+    np.testing.assert_allclose(samples.std(axis=0), 1)
+
+
+def test_antithetic_chunks_of_odd_size_pair_on_the_global_path_index():
+    simulator = GeometricBrownianMotion({'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05, 'volatility': 0.2,
+                                         'time_steps': 6, 'seed': 4, 'antithetic': True, 'simulation_paths': 9})
+    samples = np.concatenate(list(simulator.sample_chunks(3)))
+
+    # Every path is distinct, and pairs split across chunks still mirror each other
+    np.testing.assert_allclose(samples, simulator.quasi_random_samples(9))
+    assert len(np.unique(samples, axis=0)) == 9
+    np.testing.assert_allclose(samples[1::2], -samples[:-1:2])
+
+
+def test_consecutive_blocks_continue_the_sequence():
+    provider = NormalVariateProvider()
+    blocks = [provider.samples(5, count, NormalDistribution(), seed=3, offset=offset, cache=False) for count, offset in ((1000, 0), (777, 1000), (100, 1777))]
+
+    # The second and third blocks continue the engine left by the previous one
+    np.testing.assert_array_equal(np.concatenate(blocks), NormalVariateProvider().samples(5, 1877, NormalDistribution(), seed=3, cache=False))
+    assert list(provider.engines) == [(5, 3, 1877)]
+
+
+def test_drift_shift_likelihood_ratios_average_to_one():
+    simulator = GeometricBrownianMotion({'initial_stock_price': 100, 'time_to_maturity': 1, 'risk_free_rate': 0.05, 'volatility': 0.2,
+                                         'time_steps': 4, 'seed': 6, 'drift_shift': [0.5, 0.0, -1.0, 0.25]})
+    samples = simulator.quasi_random_samples(2**14)
+    ratios = simulator.likelihood_ratios(samples)
+
+    np.testing.assert_allclose(samples.mean(axis=0), [0.5, 0.0, -1.0, 0.25], atol=1e-3)
+    assert np.mean(ratios) == pytest.approx(1, abs=0.01)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from simulations.geometric_brownian_motion import GeometricBrownianMotion
+from simulations.heston_process import HestonProcess
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 100,
+        'time_to_maturity': 1,
+        'risk_free_rate': 0.05,
+        'volatility': 0.2,
+        'initial_variance': 0.04,
+        'kappa': 2.0,
+        'theta': 0.04,
+        'volvol': 0.3,
+        'rho': -0.7,
+        'time_steps': 12,
+        'simulation_paths': 4096,
+        'seed': 3,
+    }
+
+
+def test_gbm_samples_only_the_observation_times(simulation_params):
+    simulator = GeometricBrownianMotion()
+    terminal = simulator.simulate({**simulation_params, 'observation_times': [1.0]})
+
+    assert terminal.shape == (4096, 2)
+    assert simulator.sample_dimension() == 1
+
+    # The exact transition reproduces the terminal distribution of the full path
+    log_returns = np.log(terminal[:, -1] / 100)
+    assert np.isclose(log_returns.mean(), 0.05 - 0.5 * 0.2**2, atol=1e-3)
+    assert np.isclose(log_returns.std(), 0.2, atol=1e-3)
+
+
+def test_heston_stores_only_the_observed_columns(simulation_params):
+    simulator = HestonProcess()
+    full = simulator.simulate(simulation_params)
+    observed = simulator.simulate({**simulation_params, 'observation_times': [0.25, 0.5, 1.0]})
+
+    assert observed.shape == (4096, 4)
+    assert np.allclose(observed, full[:, [0, 3, 6, 12]])
+
+    with pytest.raises(ValueError):
+        simulator.simulate({**simulation_params, 'observation_times': [0.3]})
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from simulations.ornstein_uhlenbeck_process import OrnsteinUhlenbeckProcess
+
+
+@pytest.fixture
+def simulation_params():
+    return {
+        'initial_stock_price': 1.0,
+        'time_to_maturity': 2,
+        'time_steps': 4,
+        'simulation_paths': 20000,
+        'seed': 1,
+    }
+
+
+def exact_moments(x0, kappa, theta, sigma, t):
+    return theta + (x0 - theta) * np.exp(-kappa * t), sigma**2 / (2 * kappa) * (1 - np.exp(-2 * kappa * t))
+
+
+def test_exact_transition_is_unbiased_at_coarse_steps(simulation_params):
+    prices = OrnsteinUhlenbeckProcess(simulation_params, 3.0, 0.5, 0.4).simulate()
+    mean, variance = exact_moments(1.0, 3.0, 0.5, 0.4, 2)
+
+    assert prices.shape == (20000, 5)
+    assert prices[:, -1].mean() == pytest.approx(mean, abs=1e-3)
+    assert prices[:, -1].var() == pytest.approx(variance, rel=2e-2)
+
+    euler_prices = OrnsteinUhlenbeckProcess({**simulation_params, 'discretization': 'euler'}, 3.0, 0.5, 0.4).simulate()
+    assert np.abs(euler_prices[:, -1].var() - variance) > 0.5 * variance
+
+
+def test_steps_match_filtered_paths_and_observation_times(simulation_params):
+    simulator = OrnsteinUhlenbeckProcess({**simulation_params, 'time_steps': 16}, 3.0, 0.5, 0.4)
+    samples = simulator.quasi_random_samples(64)
+    prices = simulator.simulate_from_samples(samples)
+    assert np.allclose(np.column_stack(list(simulator.price_steps_from_samples(samples))), prices)
+
+    observed = OrnsteinUhlenbeckProcess({**simulation_params, 'observation_times': [0.1, 0.5, 2.0]}, 3.0, 0.5, 0.4).simulate()
+    mean, variance = exact_moments(1.0, 3.0, 0.5, 0.4, 0.1)
+    assert observed.shape == (20000, 4)
+    assert observed[:, 1].mean() == pytest.approx(mean, abs=1e-3)
+    assert observed[:, 1].var() == pytest.approx(variance, rel=2e-2)
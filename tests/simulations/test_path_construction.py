@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from simulations.path_construction import BrownianBridgeConstruction, PrincipalComponentConstruction
+from simulations.heston_process import HestonProcess
+
+
+@pytest.mark.parametrize('construction', [BrownianBridgeConstruction, PrincipalComponentConstruction])
+def test_constructions_are_orthogonal(construction):
+    time_increments = np.diff([0, 0.1, 0.3, 0.35, 0.7, 1.0, 1.2])
+    increments = construction(time_increments).increments(np.eye(6)[:, :, None])[:, :, 0]
+
+    # Unit draws map to an orthonormal basis, so the increments are independent standard normals
+    np.testing.assert_allclose(increments @ increments.T, np.eye(6), atol=1e-12)
+
+
+def test_brownian_bridge_gives_the_first_draws_the_terminal_values():
+    simulator = HestonProcess({'initial_stock_price': 100, 'time_to_maturity': 2, 'risk_free_rate': 0.03, 'initial_variance': 0.04,
+                               'kappa': 1.5, 'theta': 0.05, 'volvol': 0.5, 'rho': -0.7, 'time_steps': 10, 'seed': 3})
+    draws = simulator.quasi_random_samples(64)
+    simulator.simulation_params = {**simulator.simulation_params, 'path_construction': 'brownian_bridge'}
+    increments = simulator.quasi_random_samples(64).reshape(64, 10, 2)
+
+    # Both Brownian motions end at sqrt(T) times their first Sobol coordinate
+    np.testing.assert_allclose(increments.sum(axis=1) * np.sqrt(0.2), np.sqrt(2) * draws[:, :2])
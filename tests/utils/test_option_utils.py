@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from models.european.black_scholes import BlackScholesModel
+from utils.option_utils import OptionUtils
+
+
+def test_batch_implied_volatility_recovers_input_volatility():
+    rng = np.random.default_rng(1)
+    n = 500
+    S0 = 100.0
+    K = rng.uniform(60, 160, n)
+    T = rng.uniform(0.02, 2, n)
+    r = 0.03
+    q = 0.01
+    sigma = rng.uniform(0.05, 1.5, n)
+    is_call = rng.uniform(size=n) < 0.5
+
+    prices = BlackScholesModel().price_batch(S0, K, T, r, sigma, q, is_call)
+    implied, iterations, converged = OptionUtils.find_implied_volatility_batch(prices, S0, K, T, r, q, is_call)
+
+    # Contracts with (numerically) no time value carry no volatility information
+    vega = BlackScholesModel().greeks_batch(S0, K, T, r, sigma, q, is_call)['vega']
+    informative = vega > 1e-4
+
+    assert converged[informative].all()
+    assert np.allclose(implied[informative], sigma[informative], atol=1e-6)
+    assert iterations.max() < 100
+
+
+def test_batch_implied_volatility_matches_scalar_solver():
+    params = {
+        'initial_stock_price': 100,
+        'strike_price': 110,
+        'time_to_maturity': 0.5,
+        'risk_free_rate': 0.05,
+        'dividend_yield': 0.0,
+        'option_type': 'put',
+    }
+    market_price = 12.0
+
+    scalar_sigma, _, scalar_converged = OptionUtils.find_implied_volatility(params, market_price)
+    batch_sigma, _, batch_converged = OptionUtils.find_implied_volatility_batch([market_price], 100, 110, 0.5, 0.05, 0.0, [False])
+
+    assert scalar_converged and batch_converged[0]
+    assert np.isclose(batch_sigma[0], scalar_sigma, atol=1e-7)
+
+
+def test_batch_implied_volatility_flags_arbitrage_violations():
+    # A call quoted below intrinsic value has no implied volatility
+    sigma, _, converged = OptionUtils.find_implied_volatility_batch([1.0, 10.0], 100, 90, 1.0, 0.0, 0.0, True)
+
+    assert not converged[0] and np.isnan(sigma[0])
+    assert converged[1]
+
+
+def test_batch_implied_volatility_rejects_invalid_contracts():
+    with pytest.raises(ValueError):
+        OptionUtils.find_implied_volatility_batch([5.0, 5.0], 100, [90, 110], [1.0, 0.0], 0.0)
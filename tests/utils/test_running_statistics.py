@@ -0,0 +1,28 @@
+import numpy as np
+from utils.running_statistics import RunningStatistics
+
+
+def test_chunked_statistics_match_full_sample():
+    rng = np.random.default_rng(3)
+    values = rng.normal(2.0, 3.0, size=(10001, 2))
+
+    statistics = RunningStatistics()
+    for chunk in np.array_split(values, 7):
+        statistics.update(chunk)
+
+    assert statistics.count == values.shape[0]
+    assert np.allclose(statistics.mean, values.mean(axis=0))
+    assert np.allclose(statistics.covariance, np.cov(values, rowvar=False))
+
+
+def test_merged_statistics_match_full_sample():
+    rng = np.random.default_rng(4)
+    values = rng.exponential(size=5000)
+
+    left = RunningStatistics().update(values[:1234])
+    right = RunningStatistics().update(values[1234:])
+    merged = RunningStatistics().merge(left).merge(right)
+
+    assert np.isclose(merged.mean, values.mean())
+    assert np.isclose(merged.variance, values.var(ddof=1))
+    assert np.isclose(merged.standard_error, values.std(ddof=1) / np.sqrt(values.size))
@@ -49,3 +49,71 @@ class OptionUtils:
                 high = mid
 
         return sigma, i, False  # return the last computed implied volatility, iterations, and convergence status
+
+    @staticmethod
+    def implied_volatility_initial_guess(market_prices, S0, K, T, r, q=0.0, is_call=True):
+        # Corrado-Miller approximation, which reduces to Brenner-Subrahmanyam at the money
+        discounted_S = S0 * np.exp(-q * T)
+        discounted_K = K * np.exp(-r * T)
+
+        # Puts are mapped to calls through put-call parity
+        call_prices = np.where(is_call, market_prices, market_prices + discounted_S - discounted_K)
+
+        moneyness = (discounted_S - discounted_K) / 2
+        root = np.sqrt(np.maximum((call_prices - moneyness) ** 2 - moneyness ** 2 * 4 / np.pi, 0))
+        return np.sqrt(2 * np.pi / T) / (discounted_S + discounted_K) * (call_prices - moneyness + root)
+
+    @staticmethod
+    def find_implied_volatility_batch(market_prices, S0, K, T, r, q=0.0, is_call=True, tol=1e-8, max_iterations=100, lower_bound=1e-6, upper_bound=5.0):
+        pricer = BlackScholesModel()
+        # Broadcast the quotes and the option chain to a common shape
+        market_prices, S0, K, T, r, q = (np.asarray(x, dtype=np.float64) for x in (market_prices, S0, K, T, r, q))
+        market_prices, S0, K, T, r, q, is_call = np.broadcast_arrays(market_prices, S0, K, T, r, q, np.asarray(is_call, dtype=bool))
+        if np.any(S0 <= 0) or np.any(K <= 0) or np.any(T <= 0):
+            raise ValueError("Stock prices, strikes and times to maturity must be positive")
+
+        sigma = np.full(S0.shape, np.nan)
+        iterations = np.zeros(S0.shape, dtype=int)
+        converged = np.zeros(S0.shape, dtype=bool)
+
+        # Quotes outside the prices attainable within the volatility bounds have no solution
+        low_prices = pricer.price_batch(S0, K, T, r, lower_bound, q, is_call)
+        high_prices = pricer.price_batch(S0, K, T, r, upper_bound, q, is_call)
+        active = np.flatnonzero((market_prices >= low_prices - tol) & (market_prices <= high_prices + tol))
+
+        # Per-contract bracket, shrunk on every evaluation since the price is increasing in sigma
+        low = np.full(active.shape, lower_bound)
+        high = np.full(active.shape, upper_bound)
+
+        guess = OptionUtils.implied_volatility_initial_guess(market_prices[active], S0[active], K[active], T[active], r[active], q[active], is_call[active])
+        s = np.where(np.isfinite(guess), np.clip(guess, lower_bound, upper_bound), 0.2)
+
+        for i in range(max_iterations):
+            if active.size == 0:
+                break
+
+            greeks = pricer.greeks_batch(S0[active], K[active], T[active], r[active], s, q[active], is_call[active])
+            diff = market_prices[active] - greeks['price']
+            iterations[active] = i
+
+            done = np.abs(diff) < tol
+            sigma[active[done]] = s[done]
+            converged[active[done]] = True
+
+            low = np.where(diff > 0, s, low)
+            high = np.where(diff > 0, high, s)
+
+            # Newton's update, falling back to bisection when it leaves the bracket
+            v = greeks['vega']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                newton = s + diff / v
+            use_newton = (v > 1e-8) & (newton > low) & (newton < high)
+            s = np.where(use_newton, newton, (low + high) / 2.0)
+
+            keep = ~done
+            active, s, low, high = active[keep], s[keep], low[keep], high[keep]
+
+        # Return the last iterate for contracts that did not converge
+        sigma[active] = s
+        iterations[active] = max_iterations
+        return sigma, iterations, converged
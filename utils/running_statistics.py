@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class RunningStatistics:
+    # Mean and covariance of a stream of samples, merged batch by batch (Chan et al.) so that
+    # chunks and partial results from different workers combine exactly
+    def __init__(self):
+        self.count = 0
+        self.sample_mean = None
+        self.comoment = None
+        self.scalar = True
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.scalar = values.ndim == 1
+        values = values.reshape(values.shape[0], -1)
+        if values.shape[0] == 0:
+            return self
+
+        batch_mean = values.mean(axis=0)
+        centred = values - batch_mean
+        self.combine(values.shape[0], batch_mean, centred.T @ centred)
+        return self
+
+    def merge(self, other: 'RunningStatistics'):
+        if other.count > 0:
+            self.scalar = other.scalar
+            self.combine(other.count, other.sample_mean, other.comoment)
+        return self
+
+    def combine(self, count, mean, comoment):
+        if self.count == 0:
+            self.count = count
+            self.sample_mean = mean.copy()
+            self.comoment = comoment.copy()
+            return
+
+        total = self.count + count
+        difference = mean - self.sample_mean
+        self.comoment = self.comoment + comoment + np.outer(difference, difference) * self.count * count / total
+        self.sample_mean = self.sample_mean + difference * count / total
+        self.count = total
+
+    def unwrap(self, values):
+        return values[0] if self.scalar else values
+
+    @property
+    def mean(self):
+        return self.unwrap(self.sample_mean)
+
+    @property
+    def covariance(self):
+        return self.comoment / (self.count - 1)
+
+    @property
+    def variance(self):
+        return self.unwrap(np.diag(self.covariance))
+
+    @property
+    def standard_error(self):
+        return np.sqrt(self.variance / self.count)